@@ -0,0 +1,206 @@
+"""Measures the throughput of `fimfic-tracker download` over synthetic tracking
+lists, with the requests going to a local fake Fimfiction server.
+
+    python benchmarks/download.py -s 100 -s 10000 -s 100000 --latency 0.02
+
+Reports, for every size, how many stories were checked per second, how many
+bytes were downloaded per second and the peak RSS of the process.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import click
+
+from fake_server import DATE_MODIFIED, FakeFimfiction
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+SETTINGS_TEMPLATE = """\
+from pathlib import Path
+
+tracker_file = Path({tracker_file!r})
+tracker_backend = {backend!r}
+download_dir = Path({download_dir!r})
+cache_dir = Path({cache_dir!r})
+fimfic_base_url = {base_url!r}
+download_delay = 0
+max_requests_per_second = 0
+request_backoff = 0
+check_concurrency = {check_jobs}
+download_concurrency = {download_jobs}
+"""
+
+
+def make_tracker(amount: int, update_ratio: float) -> dict:
+    """Returns a tracking list of the given amount of stories, of which
+    update_ratio of them have an update on the fake server."""
+    updated = int(amount * update_ratio)
+    return {
+        str(i): {
+            "title": f"Story {i}",
+            "author": f"Author {i % 1000}",
+            "chapter-amt": 10,
+            "words": 10_000,
+            "last-update-timestamp": 0 if i <= updated else DATE_MODIFIED,
+            "completion-status": 1,
+        }
+        for i in range(1, amount + 1)
+    }
+
+
+def run_cli(args: list, env: dict) -> tuple:
+    """Runs fimfic-tracker with the given arguments, returning its exit code,
+    the seconds it ran for and its peak RSS in bytes, None where it can't be
+    measured."""
+    start = perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "fimfic_tracker", *args],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if not hasattr(os, "wait4"):
+        returncode = proc.wait()
+        return returncode, perf_counter() - start, None
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = perf_counter() - start
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else.
+    max_rss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return proc.returncode, elapsed, max_rss
+
+
+def run_benchmark(server: FakeFimfiction, amount: int, options: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="fimfic-bench-") as tmp:
+        tmp = Path(tmp)
+        tracker_json = tmp / "track-data.json"
+        with tracker_json.open("w", encoding="utf-8") as f:
+            json.dump(make_tracker(amount, options["update_ratio"]), f)
+
+        settings = tmp / "settings.py"
+        settings.write_text(
+            SETTINGS_TEMPLATE.format(
+                tracker_file=str(
+                    tracker_json if options["backend"] == "json" else tmp / "track.db"
+                ),
+                backend=options["backend"],
+                download_dir=str(tmp / "downloads"),
+                cache_dir=str(tmp / "cache"),
+                base_url=server.base_url,
+                check_jobs=options["check_jobs"],
+                download_jobs=options["download_jobs"],
+            )
+        )
+
+        # HOME is moved so that neither the user settings nor their config
+        # cache get involved.
+        env = {**os.environ, "PYTHONPATH": str(ROOT_DIR), "HOME": str(tmp)}
+        config_args = ["--config", str(settings)]
+
+        if options["backend"] != "json":
+            returncode, _, _ = run_cli([*config_args, "import", str(tracker_json)], env)
+            if returncode:
+                raise click.ClickException("Couldn't import the tracking list.")
+
+        server.reset_stats()
+        returncode, elapsed, max_rss = run_cli(
+            [*config_args, "download", "--assume-yes"], env
+        )
+
+    return {
+        "stories": amount,
+        "returncode": returncode,
+        "seconds": elapsed,
+        "stories_per_second": amount / elapsed,
+        "bytes_per_second": server.stats["download_bytes"] / elapsed,
+        "max_rss": max_rss,
+        **server.stats,
+    }
+
+
+@click.command()
+@click.option(
+    "--stories",
+    "-s",
+    "sizes",
+    type=int,
+    multiple=True,
+    default=[100, 1000, 10_000],
+    show_default=True,
+    help="Size of the tracking list to benchmark, can be given more than once.",
+)
+@click.option(
+    "--update-ratio",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Fraction of the stories that have an update to download.",
+)
+@click.option("--latency", type=float, default=0, show_default=True)
+@click.option("--payload-size", type=int, default=100_000, show_default=True)
+@click.option("--error-rate", type=float, default=0, show_default=True)
+@click.option(
+    "--backend",
+    type=click.Choice(["json", "sqlite"]),
+    default="json",
+    show_default=True,
+)
+@click.option("--check-jobs", type=int, default=4, show_default=True)
+@click.option("--download-jobs", type=int, default=2, show_default=True)
+@click.option("--json", "as_json", is_flag=True, help="Print the results as JSON.")
+def main(sizes, latency, payload_size, error_rate, as_json, **options):
+    server = FakeFimfiction(
+        ("127.0.0.1", 0),
+        latency=latency,
+        payload_size=payload_size,
+        error_rate=error_rate,
+    )
+    server.start()
+
+    results = []
+    try:
+        for amount in sizes:
+            result = run_benchmark(server, amount, options)
+            results.append(result)
+
+            if not as_json:
+                max_rss = result["max_rss"]
+                click.echo(
+                    f"{amount:>8} stories  {result['seconds']:8.2f} s  "
+                    f"{result['stories_per_second']:9.1f} stories/s  "
+                    f"{result['bytes_per_second'] / 1024 ** 2:8.2f} MiB/s  "
+                    + (
+                        f"peak RSS {max_rss / 1024 ** 2:7.1f} MiB  "
+                        if max_rss is not None
+                        else ""
+                    )
+                    + f"{result['errors']} errors"
+                    + (
+                        f"  (exit code {result['returncode']})"
+                        if result["returncode"]
+                        else ""
+                    )
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+
+    sys.exit(1 if any(r["returncode"] for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
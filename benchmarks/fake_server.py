@@ -0,0 +1,199 @@
+"""Stand-in for the parts of Fimfiction that fimfic-tracker makes requests to,
+so that it can be benchmarked without going near the real site.
+
+Serves the story API and the download endpoints for any story ID, waiting
+--latency seconds before answering and failing --error-rate of the requests
+with a 503.
+
+    python benchmarks/fake_server.py --port 8000 --latency 0.05
+
+Then point fimfic-tracker to it with `fimfic_base_url = "http://127.0.0.1:8000"`.
+"""
+
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+# Every story was last modified at this timestamp, so trackers that have an
+# older one see an update.
+DATE_MODIFIED = 1_600_000_000
+
+DOWNLOAD_PATH_REGEX = re.compile(r"/story/download/(\d+)/(txt|html|epub)")
+CHAPTER_DOWNLOAD_PATH_REGEX = re.compile(r"/chapters/download/(\d+)/(txt|html)")
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+def make_story(story_id: str, chapters: int) -> dict:
+    """Returns the API data of the given story, as Fimfiction would send it."""
+    return {
+        "id": int(story_id),
+        "title": f"Story {story_id}",
+        "author": {
+            "id": int(story_id) % 1000,
+            "name": f"Author {int(story_id) % 1000}",
+        },
+        "chapters": [
+            {
+                "id": int(story_id) * 1000 + i,
+                "title": f"Chapter {i}",
+                "words": 1000,
+                "date_modified": DATE_MODIFIED,
+            }
+            for i in range(1, chapters + 1)
+        ],
+        "words": chapters * 1000,
+        "date_modified": DATE_MODIFIED,
+        "status": "Incomplete",
+    }
+
+
+class FakeFimfictionHandler(BaseHTTPRequestHandler):
+    # Keeps connections open between requests, as Fimfiction does.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+
+        if server.latency:
+            sleep(server.latency)
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.count(errors=1)
+            self.send_body(503, b"", "text/plain")
+            return
+
+        download_match = DOWNLOAD_PATH_REGEX.fullmatch(url.path)
+        if url.path == "/api/story.php":
+            story_id = parse_qs(url.query).get("story", [""])[0]
+            if not story_id.isdigit():
+                self.send_body(400, b"", "text/plain")
+                return
+
+            body = json.dumps({"story": make_story(story_id, server.chapters)})
+            self.send_body(200, body.encode(), "application/json")
+            server.count(api_requests=1)
+        elif download_match:
+            self.send_payload(server.payload_size)
+            server.count(downloads=1, download_bytes=server.payload_size)
+        elif CHAPTER_DOWNLOAD_PATH_REGEX.fullmatch(url.path):
+            # The story payload split evenly between its chapters.
+            size = server.payload_size // max(1, server.chapters)
+            self.send_payload(size)
+            server.count(chapter_downloads=1, download_bytes=size)
+        else:
+            self.send_body(404, b"", "text/plain")
+
+    def send_body(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_payload(self, size: int):
+        chunk = self.server.payload_chunk
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+
+        while size > 0:
+            self.wfile.write(chunk[:size])
+            size -= len(chunk)
+
+
+class FakeFimfiction(ThreadingHTTPServer):
+    """HTTP server answering like Fimfiction does, that keeps count of what it
+    served.
+
+    Arguments:
+        address {tuple} -- Host and port to listen on, port 0 picks a free one.
+
+    Keyword Arguments:
+        latency {float} -- Seconds to wait before answering. (default: {0})
+        payload_size {int} -- Size in bytes of every download. (default: {100000})
+        error_rate {float} -- Fraction of requests answered with a 503.
+        (default: {0})
+        chapters {int} -- Amount of chapters of every story. (default: {10})
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address, *, latency=0, payload_size=100_000, error_rate=0, chapters=10
+    ):
+        super().__init__(address, FakeFimfictionHandler)
+        self.latency = latency
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.chapters = chapters
+        self.payload_chunk = b"x" * WRITE_CHUNK_SIZE
+
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, **amounts):
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = {
+                "api_requests": 0,
+                "downloads": 0,
+                "chapter_downloads": 0,
+                "download_bytes": 0,
+                "errors": 0,
+            }
+
+    def start(self) -> threading.Thread:
+        """Serves requests on a background thread until `shutdown` is called."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", "-p", default=8000, show_default=True)
+@click.option("--latency", type=float, default=0, show_default=True)
+@click.option("--payload-size", type=int, default=100_000, show_default=True)
+@click.option("--error-rate", type=float, default=0, show_default=True)
+@click.option("--chapters", type=int, default=10, show_default=True)
+def main(host, port, latency, payload_size, error_rate, chapters):
+    server = FakeFimfiction(
+        (host, port),
+        latency=latency,
+        payload_size=payload_size,
+        error_rate=error_rate,
+        chapters=chapters,
+    )
+    click.echo(f"Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        click.echo(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measures the memory taken by a tracking list loaded from a JSON tracker file,
+with its stories kept as plain dicts against as StoryRecord objects.
+
+    python benchmarks/memory.py -s 100000 -s 1000000
+"""
+
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+import click
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fimfic_tracker.records import StoryRecord  # noqa: E402 isort:skip
+
+
+def make_tracker_json(amount: int) -> str:
+    """Returns a tracker file of the given amount of stories, as they look
+    after having been checked a few times."""
+    return json.dumps(
+        {
+            str(i): {
+                "title": f"Story {i}",
+                "author": f"Author {i % 5000}",
+                "chapter-amt": i % 200,
+                "words": i * 37 % 500_000,
+                "last-update-timestamp": 1_600_000_000 + i,
+                "completion-status": i % 4,
+                "content-digest": f"{i:064x}",
+                "content-size": i * 13 % 1_000_000,
+                "update-history": [1_500_000_000 + i, 1_600_000_000 + i],
+                "last-check-timestamp": 1_700_000_000.5 + i,
+            }
+            for i in range(1, amount + 1)
+        }
+    )
+
+
+def measure(tracker_json: str, object_hook) -> tuple:
+    """Returns the bytes taken by the loaded tracking list, the peak of bytes
+    taken while loading it, and the seconds it took."""
+    tracemalloc.start()
+    start = perf_counter()
+    data = json.loads(tracker_json, object_hook=object_hook)
+    elapsed = perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del data
+    return current, peak, elapsed
+
+
+@click.command()
+@click.option(
+    "--stories",
+    "-s",
+    "sizes",
+    type=int,
+    multiple=True,
+    default=[100_000, 1_000_000],
+    show_default=True,
+    help="Size of the tracking list to measure, can be given more than once.",
+)
+def main(sizes):
+    for amount in sizes:
+        tracker_json = make_tracker_json(amount)
+
+        for name, object_hook in [
+            ("dict", None),
+            ("StoryRecord", StoryRecord.from_json_object),
+        ]:
+            current, peak, elapsed = measure(tracker_json, object_hook)
+            click.echo(
+                f"{amount:>9} stories  {name:<12} "
+                f"{current / 1024 ** 2:8.1f} MiB  ({current / amount:6.0f} b/story)  "
+                f"peak {peak / 1024 ** 2:8.1f} MiB  load {elapsed:6.2f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
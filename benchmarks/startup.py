@@ -0,0 +1,87 @@
+"""Measures how long fimfic-tracker takes to start for commands that shouldn't
+need to load much, and fails if it goes over a limit.
+
+    python benchmarks/startup.py --runs 20 --max-ms 150
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import click
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+COMMANDS = [
+    ["--help"],
+    ["list", "--help"],
+    ["download", "--help"],
+    ["untrack", "--help"],
+]
+
+# Modules that have no business being imported before a request is made.
+LAZY_MODULES = ["requests", "urllib3", "sqlite3", "fimfic_tracker.client"]
+
+
+def time_python(args: list, env: dict) -> float:
+    start = perf_counter()
+    subprocess.run(
+        [sys.executable, *args], env=env, check=True, stdout=subprocess.DEVNULL
+    )
+    return (perf_counter() - start) * 1000
+
+
+@click.command()
+@click.option("--runs", "-n", default=10, show_default=True, help="Runs per command.")
+@click.option(
+    "--max-ms",
+    type=float,
+    help="Fail if the median startup time of any command goes over this.",
+)
+def main(runs, max_ms):
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR)}
+
+    eager = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, fimfic_tracker.__main__; "
+            f"print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+
+    # Interpreter startup alone, to tell apart what the CLI adds on top.
+    baseline = statistics.median(time_python(["-c", "pass"], env) for _ in range(runs))
+    click.echo(f"{'python -c pass':<24} median {baseline:7.1f} ms")
+
+    failed = bool(eager)
+    for args in COMMANDS:
+        timings = [
+            time_python(["-m", "fimfic_tracker", *args], env) for _ in range(runs)
+        ]
+        median = statistics.median(timings)
+        click.echo(
+            f"{' '.join(args):<24} median {median:7.1f} ms  "
+            f"min {min(timings):7.1f} ms  (+{median - baseline:.1f} ms)"
+        )
+
+        if max_ms is not None and median > max_ms:
+            failed = True
+
+    if eager:
+        click.secho(
+            "Imported at startup: " + ", ".join(eager), err=True, fg="bright_red"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
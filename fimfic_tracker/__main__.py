@@ -1,27 +1,240 @@
 import json
 import re
-from time import sleep
+import signal
+from itertools import chain
+from time import sleep, time
+from traceback import format_exception
 
 import click
 
+from .concurrency import run_pipeline
 from .confreader import load_config
 from .constants import (
+    CHECK_REFRESH_KEYS,
     CONFIG_FILE_LOCATIONS,
     FIMFIC_STORY_URL_REGEX,
-    KEYWORDS_TO_HIDE_ON_LIST,
     StoryStatus,
 )
-from .exceptions import DownloadError
+from .exceptions import DownloadError, QueryError, TrackerLockError
 from .funcs import (
     confirm,
     download_story,
     get_confirm_state,
-    get_date_from_timestamp,
-    get_highlighted_value,
+    get_content_data,
+    get_saved_str,
     get_story_data,
+    get_story_diff,
     has_an_update,
-    save_to_track_file,
+    raise_system_exit,
 )
+from .listing import LIST_FORMATS, iter_list_output, write_buffered
+from .progress import get_progress
+from .query import SORT_KEYS, parse_query, parse_sort
+from .schedule import (
+    CheckQueue,
+    get_due_stories,
+    get_next_check_timestamp,
+    record_check,
+)
+from .shards import (
+    ShardResults,
+    get_shard,
+    get_shard_results_path,
+    merge_shard_results,
+    parse_shard,
+)
+from .stats import get_stats
+from .storage import open_tracker_store
+
+
+class LazyState(dict):
+    """Context object that only loads the config and the tracking list once a
+    command asks for them, keeping commands that don't need them fast."""
+
+    def __init__(self, config_path=None):
+        super().__init__()
+        self.config_path = config_path
+
+    def __missing__(self, key):
+        if key == "config":
+            from pathlib import Path
+
+            value = load_config(
+                CONFIG_FILE_LOCATIONS
+                + ([Path(self.config_path)] if self.config_path else [])
+            )
+        elif key == "track-data":
+            try:
+                value = open_tracker_store(self["config"])
+            except TrackerLockError as err:
+                self._exit_on_lock_error(err)
+
+            # Turns SIGTERM into an exception like SIGINT already is, so that
+            # pending changes to the tracking list are written before exiting.
+            signal.signal(signal.SIGTERM, raise_system_exit)
+        else:
+            raise KeyError(key)
+
+        self[key] = value
+        return value
+
+    def close(self):
+        """Closes the tracking list if it was loaded, exiting with an error if
+        its pending changes couldn't be written."""
+        if "track-data" not in self:
+            return
+
+        try:
+            self["track-data"].close()
+        except TrackerLockError as err:
+            self._exit_on_lock_error(err)
+
+    def _exit_on_lock_error(self, err: TrackerLockError):
+        click.secho(
+            f"Couldn't write to the tracking list.\n{err}",
+            err=True,
+            fg=self["config"]["error_fg_color"],
+        )
+        raise SystemExit(1)
+
+
+def update_stories(
+    stories,
+    track_data,
+    config,
+    *,
+    force=False,
+    check_jobs=None,
+    download_jobs=None,
+    record_checks=False,
+    keep_going=False,
+):
+    """Checks the given stories for an update and downloads the ones that had
+    one, reporting and saving their outcome to track_data in the given order.
+
+    Arguments:
+        stories {List[tuple]} -- Pairs of story ID and story mapping.
+        track_data {TrackerStore} -- Tracking list to save the outcomes to.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        force {bool} -- Download regardless if there was an update or not.
+        (default: {False})
+        check_jobs {int} -- Stories to check at the same time.
+        (default: {check_concurrency})
+        download_jobs {int} -- Stories to download at the same time.
+        (default: {download_concurrency})
+        record_checks {bool} -- Whether or not to also save the stories that
+        didn't have an update, with when they were checked and their status,
+        for `schedule` to go by. (default: {False})
+        keep_going {bool} -- Whether or not to report errors other than
+        `DownloadError` like any other failure of a story, instead of raising
+        them. (default: {False})
+
+    Yields:
+        tuple -- Pairs of story ID and the story mapping it has after the
+        check, None if it couldn't be checked or downloaded.
+    """
+
+    def check_story(story):
+        story_id, tracker_data = story
+
+        page_data = get_story_data(story_id, config, do_echoes=False)
+        return page_data, force or has_an_update(page_data, tracker_data)
+
+    def download_updated_story(story, page_data):
+        saved_to = download_story(story[0], page_data, config, do_echoes=False)
+        if config["download_delay"]:
+            with stats.timed("download_delay"):
+                sleep(config["download_delay"])
+        return saved_to
+
+    def report_outcome(outcome):
+        story_id, tracker_data = outcome.item
+        click.secho(
+            f'Checking if "{tracker_data["title"]}" ({story_id}) had an update...',
+            fg=config["info_fg_color"],
+        )
+
+        if outcome.error is not None and not isinstance(outcome.error, DownloadError):
+            raise outcome.error
+
+        if outcome.stage == "check":
+            if outcome.error is not None:
+                click.secho(
+                    f"Couldn't check for story.\n{outcome.error}\n",
+                    err=True,
+                    fg=config["error_fg_color"],
+                )
+                return None
+
+            click.secho("Story didn't have an update.\n", fg="bright_yellow")
+            if not record_checks:
+                return tracker_data
+
+            page_data = outcome.result
+            record = record_check(
+                tracker_data, {key: page_data[key] for key in CHECK_REFRESH_KEYS}
+            )
+            track_data.update_story(story_id, record)
+            return record
+
+        page_data = outcome.result
+        if not has_an_update(page_data, tracker_data):
+            click.secho(
+                "Story didn't have an update, force downloading story.",
+                fg="bright_yellow",
+            )
+
+        record = None
+        if outcome.error is not None:
+            click.secho(
+                f"Couldn't download story.\n{outcome.error}\n",
+                err=True,
+                fg=config["error_fg_color"],
+            )
+        else:
+            click.secho(get_saved_str(outcome.output), fg=config["success_fg_color"])
+
+            record = record_check(
+                tracker_data, {**page_data, **get_content_data(outcome.output)}
+            )
+            track_data.update_story(story_id, record)
+
+        click.echo()
+        return record
+
+    progress = get_progress(config)
+    stats = get_stats()
+
+    # Stories are checked and downloaded by separate pools of threads, but
+    # their outcomes are reported and saved in the order given.
+    for outcome in run_pipeline(
+        stories,
+        check_story,
+        download_updated_story,
+        check_jobs=check_jobs or config["check_concurrency"],
+        download_jobs=download_jobs or config["download_concurrency"],
+        queue_size=config["download_queue_size"],
+    ):
+        # Keeps the progress of the downloads still going from being drawn
+        # over the report.
+        with progress.paused(), stats.timed("report"):
+            try:
+                record = report_outcome(outcome)
+            except Exception as err:
+                if not keep_going:
+                    raise
+
+                click.secho(
+                    "Couldn't update story due to an unexpected error.\n"
+                    + "".join(format_exception(type(err), err, err.__traceback__)),
+                    err=True,
+                    fg=config["error_fg_color"],
+                )
+                record = None
+
+        yield outcome.item[0], record
 
 
 @click.group()
@@ -33,29 +246,55 @@ from .funcs import (
     type=click.Path(exists=True, dir_okay=False, resolve_path=True),
     help="Config file to load over every other one.",
 )
+@click.option(
+    "--stats",
+    "stats_file",
+    metavar="PATH",
+    type=click.File("w"),
+    help="Write a JSON summary of how long each phase of the command took, and "
+    'of the bytes and requests it went through, to PATH. "-" prints it instead.',
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    metavar="PATH",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help="Profile the command with cProfile and dump the result to PATH. Only "
+    "the main thread is profiled, use --stats for the check and download "
+    "threads.",
+)
 @click.pass_context
-def main(ctx, config):
+def main(ctx, config, stats_file, profile_path):
     """An unnecessary CLI application for tracking Fimfiction stories."""
-    from pathlib import Path
+    ctx.obj = LazyState(config)
+    # Callbacks run in the order they are added, so the stats include writing
+    # the tracking list and the profile includes both.
+    ctx.call_on_close(ctx.obj.close)
 
-    ctx.ensure_object(dict)
-    ctx.obj["config"] = config = load_config(
-        CONFIG_FILE_LOCATIONS + ([Path(config)] if config else [])
-    )
+    if stats_file is not None:
+        stats = get_stats()
+        stats.enable()
+        start = time()
+
+        def write_stats():
+            summary = stats.summary()
+            summary["total_time"] = time() - start
+            json.dump(summary, stats_file, indent=4)
+            stats_file.write("\n")
+
+        ctx.call_on_close(write_stats)
 
-    download_dir = config["download_dir"]
-    if not download_dir.exists():
-        download_dir.mkdir(parents=True)
+    if profile_path is not None:
+        import cProfile
 
-    tracker_file = config["tracker_file"]
-    if not tracker_file.exists():
-        if not tracker_file.parent.exists():
-            tracker_file.parent.mkdir(parents=True)
+        profile = cProfile.Profile()
 
-        save_to_track_file({}, config)
+        def dump_profile():
+            profile.disable()
+            profile.dump_stats(profile_path)
 
-    with tracker_file.open("r") as f:
-        ctx.obj["track-data"] = json.load(f)
+        ctx.call_on_close(dump_profile)
+        profile.enable()
 
 
 @main.command(short_help="Tracks stories and downloads them.")
@@ -67,28 +306,67 @@ def main(ctx, config):
     is_flag=True,
     help="Automatically answers the overwrite prompts with Y.",
 )
+@click.option(
+    "--from-file",
+    "-F",
+    metavar="FILE",
+    type=click.File("r"),
+    help='Also track the URLs in FILE, one per line. "-" reads them from stdin. '
+    "Stories from it that are already tracked are skipped without asking, "
+    "unless --overwrite is given.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Amount of stories to get the data from at the same time. "
+    "Defaults to check_concurrency from config.",
+)
+@click.option(
+    "--download-jobs",
+    type=click.IntRange(min=1),
+    help="Amount of stories to download at the same time. "
+    "Defaults to download_concurrency from config.",
+)
 @click.pass_context
-def track(ctx, urls, skip_download, overwrite):
+def track(ctx, urls, skip_download, overwrite, from_file, jobs, download_jobs):
     """Adds the given story URLs to the tracking list and downloads them to the
     download folder.
 
     If it is already tracked, you will be asked if you want to overwrite it."""
     config = ctx.obj["config"]
+    track_data = ctx.obj["track-data"]
 
-    for url in urls:
-        match = re.match(FIMFIC_STORY_URL_REGEX, url)
+    seen_ids = set()
+    skipped = 0
+
+    def get_story_id(url):
+        nonlocal skipped
 
+        match = re.match(FIMFIC_STORY_URL_REGEX, url)
         if not match:
-            click.secho(
-                f'"{url}" doesn\'t seem like an URL from a Fimfiction story.',
-                err=True,
-                fg=config["error_fg_color"],
-            )
-            continue
+            # Reported along with the rest of the outcomes.
+            return url, None
 
         story_id = match.groupdict()["STORY_ID"]
-        if not overwrite and story_id in ctx.obj["track-data"]:
-            title = ctx.obj["track-data"][story_id]["title"]
+        if story_id in seen_ids:
+            skipped += 1
+            return None
+
+        seen_ids.add(story_id)
+        return url, story_id
+
+    # Every prompt is answered before any story is requested, so that they
+    # don't get mixed up with the output of the stories being tracked.
+    stories = []
+    for url in urls:
+        entry = get_story_id(url)
+        if entry is None:
+            continue
+
+        story_id = entry[1]
+        if story_id is not None and not overwrite and story_id in track_data:
+            title = track_data[story_id]["title"]
             msg = click.style(
                 f'You already have the story "{title}" ({story_id}) on the tracking list. '
                 "Do you want to overwrite it?",
@@ -98,29 +376,74 @@ def track(ctx, urls, skip_download, overwrite):
                 click.secho("Skipping story.", fg=config["info_fg_color"])
                 continue
 
-        try:
-            data = get_story_data(story_id, config)
-        except DownloadError as err:
+        stories.append(entry)
+
+    if from_file is not None:
+        # Read as the stories get requested, from a thread of the pipeline,
+        # which is why the tracked IDs are looked up on a copy.
+        tracked_ids = set(track_data) if not overwrite else set()
+
+        def read_stories():
+            nonlocal skipped
+
+            for line in from_file:
+                url = line.strip()
+                if not url or url.startswith("#"):
+                    continue
+
+                entry = get_story_id(url)
+                if entry is None:
+                    continue
+                if entry[1] in tracked_ids:
+                    skipped += 1
+                    continue
+                yield entry
+
+        stories = chain(stories, read_stories())
+
+    def get_story(story):
+        url, story_id = story
+        if story_id is None:
+            raise ValueError(
+                f'"{url}" doesn\'t seem like an URL from a Fimfiction story.'
+            )
+        return get_story_data(story_id, config, do_echoes=False), not skip_download
+
+    def download_new_story(story, data):
+        return download_story(story[1], data, config, do_echoes=False)
+
+    def report_outcome(outcome):
+        url, story_id = outcome.item
+
+        if story_id is None:
+            click.secho(str(outcome.error), err=True, fg=config["error_fg_color"])
+            return
+        if outcome.error is not None and not isinstance(outcome.error, DownloadError):
+            raise outcome.error
+
+        if outcome.stage == "check" and outcome.error is not None:
             click.secho(
-                f"Couldn't get data from story of ID {story_id}.\n{err}\n",
+                f"Couldn't get data from story of ID {story_id}.\n{outcome.error}\n",
                 err=True,
                 fg=config["error_fg_color"],
             )
-            continue
+            return
 
-        if not skip_download:
-            try:
-                download_story(story_id, data, config)
-            except DownloadError as err:
+        data = outcome.result
+        if outcome.stage == "download":
+            if outcome.error is not None:
                 click.secho(
-                    f"Couldn't download story.\n{err}\n",
+                    f'Couldn\'t download "{data["title"]}" ({story_id}).\n'
+                    f"{outcome.error}\n",
                     err=True,
                     fg=config["error_fg_color"],
                 )
-                continue
+                return
 
-        ctx.obj["track-data"][story_id] = data
-        save_to_track_file(ctx.obj["track-data"], config)
+            click.secho(get_saved_str(outcome.output), fg=config["success_fg_color"])
+            data = {**data, **get_content_data(outcome.output)}
+
+        track_data[story_id] = record_check(data)
 
         click.secho(
             f'"{data["title"]}" ({story_id}) has been added to the tracking list.',
@@ -128,6 +451,28 @@ def track(ctx, urls, skip_download, overwrite):
         )
         click.echo()
 
+    progress = get_progress(config)
+    stats = get_stats()
+
+    # Saved in batches by the tracking list as the stories come, see
+    # tracker_flush_every and tracker_flush_interval.
+    for outcome in run_pipeline(
+        stories,
+        get_story,
+        download_new_story,
+        check_jobs=jobs or config["check_concurrency"],
+        download_jobs=download_jobs or config["download_concurrency"],
+        queue_size=config["download_queue_size"],
+    ):
+        with progress.paused(), stats.timed("report"):
+            report_outcome(outcome)
+
+    if skipped:
+        click.secho(
+            f"Skipped {skipped} stories that were repeated or already tracked.",
+            fg=config["info_fg_color"],
+        )
+
 
 @main.command(short_help="Untracks stories.")
 @click.argument("story-ids", nargs=-1)
@@ -149,66 +494,125 @@ def untrack(ctx, story_ids):
         title = ctx.obj["track-data"][story_id]["title"]
         del ctx.obj["track-data"][story_id]
 
-        save_to_track_file(ctx.obj["track-data"], config)
-
         click.secho(
             f'Successfully removed "{title}" ({story_id}) from the tracking list.',
             fg=config["success_fg_color"],
         )
 
 
+def _parse_query_option(ctx, param, value):
+    if value is None:
+        return {}
+    try:
+        return parse_query(value)
+    except QueryError as err:
+        raise click.BadParameter(str(err))
+
+
+def _parse_sort_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_sort(value)
+    except QueryError as err:
+        raise click.BadParameter(str(err))
+
+
+# Options shared by the commands that select stories from the tracking list.
+query_option = click.option(
+    "--query",
+    "-q",
+    callback=_parse_query_option,
+    metavar="QUERY",
+    help="Only the stories that match every term of QUERY, separated by "
+    "spaces. The terms are: status:NAME[,NAME] (complete, incomplete, hiatus, "
+    'cancelled), author:NAME (quoted if it has spaces, e.g. author:"Some '
+    'Author"), words:N and chapters:N (N being 100, >100, <=100, 100..500, '
+    "100.. or ..500) and updated:AGE (<30d for within the last 30 days, >1y for "
+    "longer than a year ago, 7d..30d for in between; in h, d, w or y).",
+)
+sort_option = click.option(
+    "--sort",
+    callback=_parse_sort_option,
+    metavar="KEY",
+    help="Sort the stories by KEY, one of: {0}. Prefixed by - for descending "
+    "order, e.g. -updated.".format(", ".join(SORT_KEYS)),
+)
+
+
+def _parse_shard_option(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_shard(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+
+
+shard_option = click.option(
+    "--shard",
+    callback=_parse_shard_option,
+    metavar="K/N",
+    help="Only the stories of the Kth out of N shards, split by their ID the "
+    "same way on every process and host. Each shard uses the whole "
+    "max_requests_per_second, so divide it between shards run at the same time.",
+)
+limit_option = click.option(
+    "--limit",
+    "-l",
+    type=click.IntRange(min=1),
+    help="Only up to this amount of stories.",
+)
+
+
 @main.command("list")
 @click.option("--short", "-s", is_flag=True, help="Show only the story ID and title.")
+@click.option(
+    "--format",
+    "-f",
+    "list_format",
+    type=click.Choice(LIST_FORMATS),
+    default="text",
+    show_default=True,
+    help="Format in which to show the stories. Other than text, they are meant "
+    "to be read by other programs.",
+)
+@query_option
+@sort_option
+@limit_option
 @click.pass_context
-def _list(ctx, short):
-    """List all tracked stories."""
+def _list(ctx, short, list_format, query, sort, limit):
+    """List all tracked stories, or the ones selected by --query."""
     config = ctx.obj["config"]
 
-    if not ctx.obj["track-data"]:
+    if not ctx.obj["track-data"] and list_format == "text":
         click.secho(
             "There are no tracked stories.", err=True, fg=config["error_fg_color"]
         )
         return
 
-    if short:
-        for story_id, tracker_data in ctx.obj["track-data"].items():
-            click.secho(
-                "{0} {1}".format(
-                    click.style(f"[{story_id}]", fg="bright_cyan"),
-                    click.style(
-                        tracker_data["title"], fg=config["highlight_text_color"]
-                    ),
-                )
-            )
-        return
-
-    def echo_value(items):
-        k = click.style(items[0], fg="bright_white")
-        v = get_highlighted_value(items[1], config)
-        click.echo(f"{k} = {v}")
+    if not query and sort is None and limit is None:
+        stories = iter(ctx.obj["track-data"].items())
+    else:
+        stories = ctx.obj["track-data"].select(**query, sort=sort, limit=limit)
 
-    for story_id, tracker_data in ctx.obj["track-data"].items():
-        click.secho(f"[ID {story_id}]", fg="bright_cyan")
-        echo_value(
-            [
-                "last-update-date",
-                get_date_from_timestamp(tracker_data["last-update-timestamp"]),
-            ]
+    first_story = next(stories, None)
+    if first_story is None and list_format == "text":
+        click.secho(
+            "There are no tracked stories that match the query.",
+            err=True,
+            fg=config["error_fg_color"],
         )
+        return
 
-        for items in filter(
-            lambda i: i[0] not in KEYWORDS_TO_HIDE_ON_LIST, tracker_data.items()
-        ):
-            echo_value(items)
-
-        echo_value(
-            [
-                "completion-status",
-                StoryStatus.get_name_from(tracker_data["completion-status"]),
-            ]
+    write_buffered(
+        iter_list_output(
+            chain([first_story] if first_story else [], stories),
+            list_format,
+            config,
+            short=short,
         )
-
-        click.echo()
+    )
 
 
 @main.command()
@@ -230,13 +634,64 @@ def _list(ctx, short):
     is_flag=True,
     help="Automatically answers confirmation prompts with N.",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Amount of stories to check for an update at the same time. "
+    "Defaults to check_concurrency from config.",
+)
+@click.option(
+    "--download-jobs",
+    type=click.IntRange(min=1),
+    help="Amount of stories to download at the same time. "
+    "Defaults to download_concurrency from config.",
+)
+@click.option(
+    "--due-only",
+    is_flag=True,
+    help="Only check the stories that are due for a check given how often "
+    "they update, most likely to have updated first.",
+)
+@query_option
+@sort_option
+@limit_option
+@shard_option
+@click.option(
+    "--processes",
+    "-P",
+    type=click.IntRange(min=1),
+    help="Split the stories between this amount of processes, each of them "
+    "running a shard, and save their results to the tracking list once they "
+    "finish.",
+)
 @click.argument("story-ids", nargs=-1)
 @click.pass_context
-def download(ctx, force, assume_yes, assume_no, story_ids):
-    """Download all or given STORY_IDS of tracked stories that have updated.
+def download(
+    ctx,
+    force,
+    assume_yes,
+    assume_no,
+    jobs,
+    download_jobs,
+    due_only,
+    query,
+    sort,
+    limit,
+    shard,
+    processes,
+    story_ids,
+):
+    """Download all or given STORY_IDS of tracked stories that have updated,
+    only the ones that match --query if given.
 
     If a story is registered as any status other than 'Incomplete', you will be
-    asked if you still want to check for an update on it."""
+    asked if you still want to check for an update on it. Unless --due-only is
+    used, in which case they are checked on a much longer interval instead.
+
+    With --shard, what would be saved to the tracking list is saved to a file
+    of the shard inside of shard_results_dir instead, for the merge command to
+    save it once every shard is done."""
     config = ctx.obj["config"]
 
     if not ctx.obj["track-data"]:
@@ -253,18 +708,50 @@ def download(ctx, force, assume_yes, assume_no, story_ids):
         )
         return
 
+    if due_only and sort is not None:
+        click.secho(
+            'The options "--due-only" and "--sort" cannot be used at the same time, '
+            "due stories are checked the most overdue first.",
+            err=True,
+            fg=config["error_fg_color"],
+        )
+        return
+
+    if shard is not None and processes is not None:
+        click.secho(
+            'The options "--shard" and "--processes" cannot be used at the same time.',
+            err=True,
+            fg=config["error_fg_color"],
+        )
+        return
+
     confirm_state = get_confirm_state(assume_yes, assume_no)
 
-    def true_or_filter_ids(id_str: str) -> bool:
-        if not story_ids:
-            return True
-        return id_str in story_ids
+    # Every prompt is answered before any check starts, so that they don't get
+    # mixed up with the output of the stories being checked concurrently.
+    selected_stories = ctx.obj["track-data"].select(
+        story_ids=story_ids or None,
+        **query,
+        shard=shard,
+        sort=sort,
+        # Applied once the due stories are known instead.
+        limit=None if due_only else limit,
+    )
+    if due_only:
+        selected_stories = get_due_stories(selected_stories, config)[:limit]
+        if not selected_stories:
+            click.secho(
+                "There are no stories due for a check.", fg=config["info_fg_color"]
+            )
+            return
 
-    for story_id, tracker_data in filter(
-        lambda t: true_or_filter_ids(t[0]), ctx.obj["track-data"].items()
-    ):
+    stories_to_check = []
+    for story_id, tracker_data in selected_stories:
         title = tracker_data["title"]
-        if not tracker_data["completion-status"] == StoryStatus.incomplete:
+        if (
+            not due_only
+            and not tracker_data["completion-status"] == StoryStatus.incomplete
+        ):
             status = StoryStatus.get_name_from(tracker_data["completion-status"])
 
             msg = click.style(
@@ -276,43 +763,344 @@ def download(ctx, force, assume_yes, assume_no, story_ids):
                 click.echo()
                 continue
 
+        stories_to_check.append((story_id, tracker_data))
+
+    update_options = {
+        "force": force,
+        "check_jobs": jobs,
+        "download_jobs": download_jobs,
+        # Only the due stories go by when they were last checked.
+        "record_checks": due_only,
+    }
+
+    if processes is not None:
+        _download_in_processes(ctx, stories_to_check, processes, update_options)
+    elif shard is not None:
+        results_path = get_shard_results_path(config, shard)
+        with ShardResults(results_path) as results:
+            for _ in update_stories(
+                stories_to_check, results, config, **update_options
+            ):
+                pass
+
         click.secho(
-            f'Checking if "{title}" ({story_id}) had an update...',
+            f'Saved the results of shard {shard[0] + 1}/{shard[1]} to "{results_path}", '
+            "use the merge command to save them to the tracking list.",
             fg=config["info_fg_color"],
         )
+    else:
+        for _ in update_stories(
+            stories_to_check, ctx.obj["track-data"], config, **update_options
+        ):
+            pass
 
-        try:
-            page_data = get_story_data(story_id, config, do_echoes=False)
-        except DownloadError as err:
-            click.secho(
-                f"Couldn't check for story.\n{err}\n",
-                err=True,
-                fg=config["error_fg_color"],
-            )
-            continue
 
-        if not has_an_update(page_data, tracker_data):
-            msg = "Story didn't have an update"
-            if not force:
-                click.secho(f"{msg}.\n", fg="bright_yellow")
+def _run_shard_worker(
+    config_path, shard: tuple, story_ids: list, update_options, process_count: int
+):
+    # Runs on a process of its own, started by _download_in_processes.
+    state = LazyState(config_path)
+    try:
+        config = state["config"]
+        # Otherwise every process would draw its progress over the others.
+        get_progress(config).enabled = False
+        # The limit is for all of the processes together, so each of them gets
+        # an equal part of it. Set before the client of this process is made.
+        config["max_requests_per_second"] /= process_count
+
+        order = {story_id: i for i, story_id in enumerate(story_ids)}
+        stories = sorted(
+            state["track-data"].select(story_ids=story_ids),
+            key=lambda story: order[story[0]],
+        )
+
+        with ShardResults(get_shard_results_path(config, shard)) as results:
+            for _ in update_stories(stories, results, config, **update_options):
+                pass
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+    finally:
+        state.close()
+
+
+def _download_in_processes(ctx, stories: list, count: int, update_options: dict):
+    """Splits the stories into count shards, runs `update_stories` over each of
+    them on a process of its own, and saves their results to the tracking list
+    once every process is done."""
+    import multiprocessing
+
+    config = ctx.obj["config"]
+
+    shard_ids = [[] for _ in range(count)]
+    for story_id, _ in stories:
+        shard_ids[get_shard(story_id, count)].append(story_id)
+    active_shards = [
+        (i, story_ids) for i, story_ids in enumerate(shard_ids) if story_ids
+    ]
+
+    workers = [
+        multiprocessing.Process(
+            target=_run_shard_worker,
+            args=(
+                ctx.obj.config_path,
+                (index, count),
+                story_ids,
+                update_options,
+                len(active_shards),
+            ),
+        )
+        for index, story_ids in active_shards
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        for worker in workers:
+            worker.join()
+    finally:
+        # Also when interrupted, as each process keeps what it got done on its
+        # results file.
+        for worker in workers:
+            worker.join()
+
+        results_paths = [
+            get_shard_results_path(config, (index, count)) for index in range(count)
+        ]
+        merged, _ = merge_shard_results(
+            ctx.obj["track-data"], [path for path in results_paths if path.exists()]
+        )
+
+    failed = sum(1 for worker in workers if worker.exitcode)
+    if failed:
+        click.secho(
+            f"{failed} of the {len(workers)} processes failed, the results they "
+            "got before failing were still saved.",
+            err=True,
+            fg=config["error_fg_color"],
+        )
+    click.secho(
+        f"Saved the results of {merged} stories from {len(workers)} processes to "
+        "the tracking list.",
+        fg=config["info_fg_color"],
+    )
+
+
+@main.command(short_help="Checks stories for an update without downloading.")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    help="Amount of stories to check at the same time. "
+    "Defaults to check_concurrency from config.",
+)
+@click.option(
+    "--only-updated",
+    "-u",
+    is_flag=True,
+    help="Only output the stories that had an update, or couldn't be checked.",
+)
+@query_option
+@sort_option
+@limit_option
+@shard_option
+@click.argument("story-ids", nargs=-1)
+@click.pass_context
+def check(ctx, jobs, only_updated, query, sort, limit, shard, story_ids):
+    """Checks all or given STORY_IDS of tracked stories for an update, without
+    downloading them nor making any change to the tracking list.
+
+    Outputs a line of JSON for every story as soon as it is checked, in no
+    particular order, with the keys: "id", "title", "updated" (as download
+    sees it), "changed" (keys with a different value), and "old" and "new"
+    with the words, chapter-amt, last-update-timestamp and completion-status
+    of the story. Or "id", "title" and "error" if it couldn't be checked."""
+    config = ctx.obj["config"]
+
+    # Taken all at once, since the checks pull them from other threads.
+    stories = list(
+        ctx.obj["track-data"].select(
+            story_ids=story_ids or None, **query, shard=shard, sort=sort, limit=limit
+        )
+    )
+
+    def check_story(story):
+        return get_story_data(story[0], config, do_echoes=False), False
+
+    updated = failed = 0
+    for outcome in run_pipeline(
+        stories,
+        check_story,
+        check_jobs=jobs or config["check_concurrency"],
+        ordered=False,
+    ):
+        story_id, tracker_data = outcome.item
+        line = {"id": int(story_id), "title": tracker_data["title"]}
+
+        if outcome.error is not None:
+            if not isinstance(outcome.error, DownloadError):
+                raise outcome.error
+            failed += 1
+            line["error"] = str(outcome.error)
+        else:
+            diff = get_story_diff(outcome.result, tracker_data)
+            if diff["updated"]:
+                updated += 1
+            elif only_updated:
                 continue
+            line.update(diff)
 
-            click.secho(f"{msg}, force downloading story.", fg="bright_yellow")
+        click.echo(json.dumps(line, ensure_ascii=False))
 
-        try:
-            download_story(story_id, page_data, config)
-        except DownloadError as err:
-            click.secho(
-                f"Couldn't download story.\n{err}\n",
-                err=True,
-                fg=config["error_fg_color"],
-            )
+    click.secho(
+        f"Checked {len(stories)} stories, {updated} had an update and {failed} "
+        "couldn't be checked.",
+        err=True,
+        fg=config["info_fg_color"],
+    )
+
+
+@main.command(short_help="Saves the results of shards to the tracking list.")
+@click.option(
+    "--keep",
+    "-k",
+    is_flag=True,
+    help="Keep the results files instead of removing them once saved.",
+)
+@click.argument("results-files", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def merge(ctx, keep, results_files):
+    """Saves the results of "download --shard" from the given RESULTS_FILES, or
+    from every results file inside of shard_results_dir, to the tracking list.
+    Then removes the files.
+
+    Results of stories that were untracked, or checked again after them, are
+    left out."""
+    from pathlib import Path
+
+    config = ctx.obj["config"]
+
+    if results_files:
+        results_paths = [Path(path) for path in results_files]
+    else:
+        results_paths = sorted(
+            config["shard_results_dir"].glob("shard-*.ndjson"),
+            key=lambda path: path.stat().st_mtime,
+        )
+
+    if not results_paths:
+        click.secho("There are no results to save.", fg=config["info_fg_color"])
+        return
+
+    merged, skipped = merge_shard_results(
+        ctx.obj["track-data"], results_paths, keep=keep
+    )
+    click.secho(
+        f"Saved the results of {merged} stories from {len(results_paths)} files "
+        "to the tracking list.",
+        fg=config["success_fg_color"],
+    )
+    if skipped:
+        click.secho(
+            f"Left out {skipped} results of stories that were untracked or "
+            "checked again after them.",
+            fg=config["info_fg_color"],
+        )
+
+
+@main.command(short_help="Keeps checking stories as they become due.")
+@click.option(
+    "--poll-interval",
+    "-p",
+    type=click.FloatRange(min=1),
+    default=60,
+    show_default=True,
+    help="Maximum seconds to wait before looking for changes made to the "
+    "tracking list by other commands.",
+)
+@click.pass_context
+def watch(ctx, poll_interval):
+    """Stays running and checks every tracked story for an update once it is
+    due, like "download --due-only" does, downloading the ones that had one.
+
+    Stories tracked or untracked meanwhile are picked up without restarting."""
+    config = ctx.obj["config"]
+    track_data = ctx.obj["track-data"]
+    check_queue = CheckQueue()
+
+    def schedule_all():
+        for story_id in check_queue:
+            if story_id not in track_data:
+                check_queue.discard(story_id)
+
+        for story_id, story_data in track_data.items():
+            check_queue.push(story_id, get_next_check_timestamp(story_data, config))
+
+    schedule_all()
+    click.secho(
+        f"Watching {len(check_queue)} stories, press Ctrl+C to stop.",
+        fg=config["info_fg_color"],
+    )
+
+    while True:
+        track_data.flush()
+        if track_data.reload():
+            schedule_all()
+
+        due_stories = [
+            (story_id, track_data[story_id]) for story_id in check_queue.pop_due(time())
+        ]
+        for story_id, record in update_stories(
+            due_stories, track_data, config, record_checks=True, keep_going=True
+        ):
+            if record is None:
+                # Retried later on, instead of right away, when it fails.
+                check_queue.push(story_id, time() + config["check_min_interval"])
+            else:
+                check_queue.push(story_id, get_next_check_timestamp(record, config))
+
+        if due_stories:
+            continue
+
+        next_deadline = check_queue.next_deadline()
+        if next_deadline is None:
+            sleep(poll_interval)
         else:
-            ctx.obj["track-data"][story_id] = page_data
-            save_to_track_file(ctx.obj["track-data"], config)
+            sleep(min(max(next_deadline - time(), 0), poll_interval))
 
-        click.echo()
-        sleep(config["download_delay"])
+
+@main.command("import", short_help="Imports a JSON tracker file.")
+@click.argument(
+    "json-file", type=click.Path(exists=True, dir_okay=False, resolve_path=True)
+)
+@click.option(
+    "--overwrite",
+    "-o",
+    is_flag=True,
+    help="Overwrite stories that are already on the tracking list.",
+)
+@click.pass_context
+def _import(ctx, json_file, overwrite):
+    """Adds the stories of the given JSON_FILE, a tracker file as saved by the
+    "json" tracker backend, to the tracking list.
+
+    Useful to move an existing tracking list to the "sqlite" tracker backend."""
+    config = ctx.obj["config"]
+
+    with open(json_file, "r", encoding="utf-8") as f:
+        imported_data = json.load(f)
+
+    imported = 0
+    for story_id, story_data in imported_data.items():
+        if not overwrite and story_id in ctx.obj["track-data"]:
+            continue
+
+        ctx.obj["track-data"][story_id] = story_data
+        imported += 1
+
+    click.secho(
+        f"Imported {imported} of {len(imported_data)} stories to the tracking list.",
+        fg=config["success_fg_color"],
+    )
 
 
 @main.command()
@@ -324,11 +1112,10 @@ def migrate(ctx):
     migrated_data = []
 
     for story_id, tracker_data in ctx.obj["track-data"].items():
-        tracker_data["id"] = int(story_id)
-        migrated_data.append(tracker_data)
+        migrated_data.append({**tracker_data, "id": int(story_id)})
 
     print(json.dumps(migrated_data, ensure_ascii=False))
 
 
 if __name__ == "__main__":
-    main(obj={})
+    main()
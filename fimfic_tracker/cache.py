@@ -0,0 +1,132 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+from time import time
+
+
+class StoryCache:
+    """On-disk cache of the story data obtained from the Fimfiction API, kept
+    as one file per story along the validators of the response it came from.
+
+    Arguments:
+        directory {Path} -- Directory in which to keep the cached entries.
+        ttl {int or float} -- Seconds in which an entry is considered fresh
+        enough to be used without asking Fimfiction, 0 to always ask.
+    """
+
+    def __init__(self, directory: Path, ttl):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, story_id: str) -> Path:
+        return self.directory / f"{story_id}.json"
+
+    def get(self, story_id: str) -> dict:
+        """Returns the cached entry of the given story ID.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+
+        Returns:
+            dict -- Entry mapping of the following keys, or None if there is no
+            valid entry for the story:
+                - `etag` {str} -- ETag header of the response, if any.
+                - `last-modified` {str} -- Last-Modified header of the
+                response, if any.
+                - `fetched-at` {float} -- Timestamp of when the entry was last
+                confirmed to be current.
+                - `data` {dict} -- Story mapping from `funcs.get_story_data`.
+                - `chapters` {List[dict]} -- Chapter manifest of the story, if
+                it was saved.
+        """
+        try:
+            with self._path(story_id).open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+                entry["fetched-at"] = os.fstat(f.fileno()).st_mtime
+        except (OSError, ValueError):
+            return None
+
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Whether or not the entry can be used without revalidating it.
+
+        Arguments:
+            entry {dict} -- Entry mapping from `StoryCache.get`.
+
+        Returns:
+            bool -- True if the entry is still within the TTL.
+        """
+        return self.ttl > 0 and time() - entry["fetched-at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """Returns the headers that make a request conditional on the response
+        being different from the one of the entry.
+
+        Arguments:
+            entry {dict} -- Entry mapping from `StoryCache.get`.
+
+        Returns:
+            dict -- Request headers.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last-modified"):
+            headers["If-Modified-Since"] = entry["last-modified"]
+        return headers
+
+    def put(self, story_id: str, data: dict, response_headers, *, chapters=None):
+        """Saves the story data as the entry of the given story ID.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+            data {dict} -- Story mapping from `funcs.get_story_data`.
+            response_headers {Mapping} -- Headers of the response the data
+            came from.
+
+        Keyword Arguments:
+            chapters {List[dict]} -- Chapter manifest of the story.
+            (default: {None})
+        """
+        entry = {
+            "etag": response_headers.get("ETag"),
+            "last-modified": response_headers.get("Last-Modified"),
+            "data": data,
+            "chapters": chapters,
+        }
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(story_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def touch(self, story_id: str):
+        """Marks the entry of the given story ID as just confirmed to be
+        current, without rewriting it.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+        """
+        os.utime(self._path(story_id))
+
+
+def get_story_cache(config: dict) -> StoryCache:
+    """Returns the story cache as specified in config.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Returns:
+        StoryCache -- The story cache, None if it is disabled.
+    """
+    if not config["story_cache"]:
+        return None
+    return StoryCache(config["cache_dir"] / "stories", config["story_cache_ttl"])
@@ -0,0 +1,216 @@
+import hashlib
+import html
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from .client import DownloadResult, get_client
+from .constants import CHAPTER_DOWNLOAD_PATH_BY_FORMAT
+from .contentstore import get_content_store
+from .stats import get_stats
+
+BODY_REGEX = re.compile(rb"<body[^>]*>(.*)</body>", re.DOTALL | re.IGNORECASE)
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ChapterManifest:
+    """Chapters of a story downloaded one by one, kept inside of a directory of
+    their own along with a manifest of what was downloaded of each of them.
+
+    Arguments:
+        directory {Path} -- Directory in which to keep the chapters.
+        dl_format {str} -- Format of the chapters.
+    """
+
+    def __init__(self, directory: Path, dl_format: str):
+        self.directory = directory
+        self.format = dl_format
+        self.manifest_path = directory / "manifest.json"
+
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if manifest.get("format") != dl_format:
+            manifest = {}
+
+        self.chapters = {str(c["id"]): c for c in manifest.get("chapters", [])}
+        self.output = manifest.get("output")
+
+    def chapter_path(self, chapter_id) -> Path:
+        return self.directory / f"{chapter_id}.{self.format}"
+
+    def is_current(self, chapter: dict) -> bool:
+        """Whether or not the saved copy of the chapter is the same as the one
+        described by chapter, from `funcs.StoryData.chapters`."""
+        saved = self.chapters.get(str(chapter["id"]))
+        return (
+            saved is not None
+            and saved["date-modified"] == chapter["date-modified"]
+            and saved["words"] == chapter["words"]
+            and self.chapter_path(chapter["id"]).exists()
+        )
+
+    def save(self, chapters: list, output: dict):
+        """Writes the manifest with the given chapters, and removes the saved
+        chapters that aren't among them anymore.
+
+        Arguments:
+            chapters {List[dict]} -- Chapters from `funcs.StoryData.chapters`.
+            output {dict} -- Path, size and digest of the assembled story.
+        """
+        kept = {str(chapter["id"]) for chapter in chapters}
+        for chapter_id in self.chapters.keys() - kept:
+            try:
+                self.chapter_path(chapter_id).unlink()
+            except FileNotFoundError:
+                pass
+
+        manifest = {"format": self.format, "chapters": chapters, "output": output}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.chapters = {str(c["id"]): c for c in chapters}
+        self.output = output
+
+
+def _write_story(write, story_data: dict, chapter_paths: list, dl_format: str):
+    title = story_data["title"]
+    author = story_data["author"]
+
+    if dl_format == "html":
+        write(
+            '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            f"<title>{html.escape(title)}</title>\n</head>\n<body>\n"
+            f"<h1>{html.escape(title)}</h1>\n<p>by {html.escape(author)}</p>\n".encode()
+        )
+        for path in chapter_paths:
+            # Every chapter comes as a whole document, of which only the body
+            # goes into the story.
+            content = path.read_bytes()
+            match = BODY_REGEX.search(content)
+            write(match.group(1) if match else content)
+            write(b"\n")
+        write(b"</body>\n</html>\n")
+    else:
+        write(f"{title}\nby {author}\n\n".encode())
+        for path in chapter_paths:
+            with path.open("rb") as chapter:
+                for chunk in iter(lambda: chapter.read(READ_CHUNK_SIZE), b""):
+                    write(chunk)
+            write(b"\n\n")
+
+
+def download_chapters(
+    story_id: str, story_data, path: Path, config: dict, *, on_progress=None
+) -> DownloadResult:
+    """Downloads only the chapters of the story that are new or changed since
+    the last time, and puts the story together at path from every chapter.
+
+    Arguments:
+        story_id {str} -- ID of the story.
+        story_data {StoryData} -- Story mapping from `funcs.get_story_data`,
+        with its chapters.
+        path {Path} -- Where to save the story.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        on_progress {Callable} -- Called with the bytes downloaded so far after
+        each chunk. (default: {None})
+
+    Returns:
+        DownloadResult -- Where the story was saved to, with its size and
+        digest.
+    """
+    dl_format = config["download_format"]
+    directory = config["cache_dir"] / "chapters" / story_id
+    directory.mkdir(parents=True, exist_ok=True)
+
+    manifest = ChapterManifest(directory, dl_format)
+    client = get_client(config)
+    stats = get_stats()
+
+    downloaded = 0
+    changed = False
+    for chapter in story_data.chapters:
+        if manifest.is_current(chapter):
+            stats.count("chapters_reused")
+            continue
+
+        done = downloaded
+
+        def report_progress(size, total):
+            if on_progress is not None:
+                on_progress(done + size, None)
+
+        result = client.download(
+            config["fimfic_base_url"]
+            + CHAPTER_DOWNLOAD_PATH_BY_FORMAT[dl_format].format(
+                CHAPTER_ID=chapter["id"]
+            ),
+            manifest.chapter_path(chapter["id"]),
+            on_progress=report_progress,
+        )
+        stats.count("chapters_downloaded")
+        downloaded += result.size
+        changed = True
+
+    chapter_ids = [str(chapter["id"]) for chapter in story_data.chapters]
+    removed = bool(manifest.chapters.keys() - set(chapter_ids))
+    output = manifest.output
+
+    if (
+        not changed
+        and not removed
+        and output is not None
+        and output["path"] == str(path)
+        and path.exists()
+    ):
+        return DownloadResult(path, output["size"], output["digest"], True)
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp_path.open("wb") as f:
+
+            def write(content: bytes):
+                nonlocal size
+                digest.update(content)
+                f.write(content)
+                size += len(content)
+
+            _write_story(
+                write,
+                story_data,
+                [manifest.chapter_path(i) for i in chapter_ids],
+                dl_format,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+        content_store = get_content_store(config)
+        if content_store is not None:
+            content_store.save(tmp_path, digest.hexdigest(), path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+    manifest.save(
+        story_data.chapters,
+        {"path": str(path), "size": size, "digest": digest.hexdigest()},
+    )
+    return DownloadResult(path, size, digest.hexdigest(), False)
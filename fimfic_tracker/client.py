@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+from .concurrency import RateLimiter
+from .exceptions import RequestError
+from .stats import get_stats
+
+RETRY_ON_STATUS = (500, 502, 503, 504)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class DownloadResult(NamedTuple):
+    """Outcome of `HTTPClient.download`.
+
+    Attributes:
+        path {Path} -- Where the file was saved to.
+        size {int} -- Size of the file in bytes.
+        digest {str} -- SHA-256 hex digest of the file.
+        unchanged {bool} -- Whether or not the file was already there as is,
+        and so left untouched.
+    """
+
+    path: Path
+    size: int
+    digest: str
+    unchanged: bool
+
+
+class HTTPClient:
+    """Session shared by every request made to Fimfiction, keeping connections
+    alive between them and retrying the ones that fail on their own.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+    """
+
+    def __init__(self, config: dict):
+        self.timeout = (config["connect_timeout"], config["read_timeout"])
+        self.rate_limiter = RateLimiter(config["max_requests_per_second"])
+
+        self.max_retries = config["request_retries"]
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=config["request_backoff"],
+            status_forcelist=RETRY_ON_STATUS,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_maxsize=max(
+                config["check_concurrency"], config["download_concurrency"], 1
+            ),
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        get_stats().add_source("connections", self.stats)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Makes a GET request to the given URL once the rate limit allows it.
+
+        Arguments:
+            url {str} -- URL to request.
+
+        Keyword Arguments:
+            kwargs -- Keyword arguments to use on `requests.Session.get`.
+
+        Returns:
+            requests.Response -- The response to the request.
+        """
+        self.rate_limiter.wait()
+        kwargs.setdefault("timeout", self.timeout)
+
+        try:
+            return self.session.get(url, **kwargs)
+        except requests.RequestException as err:
+            raise RequestError(err)
+
+    def download(
+        self, url: str, path: Path, *, on_progress=None, content_store=None
+    ) -> "DownloadResult":
+        """Downloads the response of the given URL into path.
+
+        The response is first written to a ".part" file next to path, which
+        replaces path once it is complete. If the connection drops before that,
+        the download resumes from where it was left with a Range request, be it
+        right away or on a later call with the same URL and path.
+
+        If path already exists, the response is compared against it instead as
+        it is downloaded, unless its Content-Length already tells them apart.
+        Nothing is written unless they turn out to be different.
+
+        Arguments:
+            url {str} -- URL to download.
+            path {Path} -- Where to save the response.
+
+        Keyword Arguments:
+            on_progress {Callable} -- Called with the bytes downloaded so far
+            and the total, None if unknown, after each chunk. (default: {None})
+            content_store {ContentStore} -- Store to save the response to,
+            leaving a hardlink to it at path. (default: {None})
+
+        Returns:
+            DownloadResult -- Where the file was saved to, with its size and
+            digest.
+        """
+        part_path = path.with_name(path.name + ".part")
+        state_path = path.with_name(path.name + ".part.json")
+        stats = get_stats()
+
+        last_error = None
+        attempts = self.max_retries + 1
+        while attempts:
+            attempts -= 1
+            state = self._read_part_state(state_path, url)
+            offset = part_path.stat().st_size if state and part_path.exists() else 0
+
+            # Content-Encoding would make the byte ranges not match the file.
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+                validator = state.get("etag") or state.get("last-modified")
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                with self.get(url, stream=True, headers=headers) as r:
+                    resumed = r.status_code == 206
+                    if resumed:
+                        start, total = _parse_content_range(r.headers)
+                        # A range that wasn't asked for doesn't match either.
+                        expected = (offset, state.get("length")) if offset else None
+                        mismatched = (start, total) != expected
+                    else:
+                        mismatched = r.status_code == 416
+
+                    if mismatched:
+                        last_error = RequestError(
+                            f"Couldn't resume the download of {url}, the server "
+                            "answered with a range that doesn't match the file."
+                        )
+                        if offset:
+                            # What was saved doesn't fit the file anymore, so
+                            # it is downloaded again from the start. Which
+                            # doesn't count as another attempt.
+                            part_path.unlink()
+                            attempts += 1
+                        continue
+                    r.raise_for_status()
+
+                    if not resumed:
+                        offset = 0
+                        total = r.headers.get("Content-Length")
+                        total = int(total) if total is not None else None
+                        self._write_part_state(state_path, url, r.headers, total)
+
+                    digest = hashlib.sha256()
+                    if offset:
+                        _hash_file(part_path, digest)
+
+                    # Compared against the file it would replace as it comes,
+                    # unless the sizes already tell them apart. Without a
+                    # Content-Length, that is only known at the end.
+                    existing = None
+                    existing_size = None if offset else _get_size(path)
+                    if existing_size is not None and total in (None, existing_size):
+                        existing = path.open("rb")
+
+                    size = offset
+                    write_time = 0.0
+                    f = None
+
+                    def stop_comparing():
+                        # From here on it is a regular download, with what
+                        # matched so far copied from the file.
+                        nonlocal existing, f
+                        f = part_path.open("wb")
+                        existing.seek(0)
+                        _copy_bytes(existing, f, size)
+                        existing.close()
+                        existing = None
+
+                    try:
+                        if existing is None:
+                            f = part_path.open("ab" if offset else "wb")
+
+                        for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            digest.update(chunk)
+
+                            if (
+                                existing is not None
+                                and existing.read(len(chunk)) != chunk
+                            ):
+                                stop_comparing()
+
+                            if f is not None:
+                                start = perf_counter()
+                                f.write(chunk)
+                                write_time += perf_counter() - start
+
+                            size += len(chunk)
+                            if on_progress is not None:
+                                on_progress(size, total)
+
+                        if existing is not None and size != existing_size:
+                            # The response ended before the file did.
+                            stop_comparing()
+
+                        if f is not None:
+                            start = perf_counter()
+                            f.flush()
+                            os.fsync(f.fileno())
+                            write_time += perf_counter() - start
+                    finally:
+                        if f is not None:
+                            f.close()
+                        if existing is not None:
+                            existing.close()
+                        stats.record("download_write", write_time)
+                        stats.count("download_bytes", size - offset)
+            except requests.HTTPError as err:
+                raise RequestError(err)
+            except requests.RequestException as err:
+                # Only errors while streaming get here, as the ones on
+                # connecting were already retried by the session.
+                last_error = RequestError(err)
+                continue
+
+            if total is not None and size != total:
+                last_error = RequestError(
+                    f"Connection closed after {size} of {total} bytes."
+                )
+                continue
+
+            unchanged = f is None
+            if unchanged:
+                stats.count("unchanged_downloads")
+            elif content_store is not None:
+                content_store.save(part_path, digest.hexdigest(), path)
+            else:
+                os.replace(part_path, path)
+            state_path.unlink()
+            return DownloadResult(path, size, digest.hexdigest(), unchanged)
+
+        raise last_error
+
+    @staticmethod
+    def _read_part_state(state_path: Path, url: str) -> dict:
+        try:
+            with state_path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get("url") == url else None
+
+    @staticmethod
+    def _write_part_state(state_path: Path, url: str, headers, length: int):
+        with state_path.open("w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "url": url,
+                    "etag": headers.get("ETag"),
+                    "last-modified": headers.get("Last-Modified"),
+                    "length": length,
+                },
+                f,
+            )
+
+    def stats(self) -> dict:
+        """Returns the amount of requests sent and connections opened so far by
+        the session.
+
+        Returns:
+            dict -- Mapping of the following keys:
+                - `requests` {int} -- Requests sent, retries included.
+                - `connections` {int} -- New connections opened.
+                - `reused` {int} -- Requests sent over an already open
+                connection.
+        """
+        pools = self.adapter.poolmanager.pools
+        sent = opened = 0
+        for key in pools.keys():
+            pool = pools[key]
+            sent += pool.num_requests
+            opened += pool.num_connections
+
+        return {"requests": sent, "connections": opened, "reused": sent - opened}
+
+
+def _get_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+def _hash_file(path: Path, digest):
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+
+def _copy_bytes(source, destination, amount: int):
+    while amount > 0:
+        chunk = source.read(min(amount, DOWNLOAD_CHUNK_SIZE))
+        destination.write(chunk)
+        amount -= len(chunk)
+
+
+def _parse_content_range(headers) -> tuple:
+    """Returns the first byte position and the complete length from the
+    Content-Range header, with None for any that is missing."""
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", headers.get("Content-Range", ""))
+    if not match:
+        return None, None
+
+    start, total = match.groups()
+    return int(start), (int(total) if total != "*" else None)
+
+
+def get_client(config: dict) -> HTTPClient:
+    """Returns the HTTP client of this process, creating it on its first call.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Returns:
+        HTTPClient -- The shared client.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient(config)
+        return _client
@@ -0,0 +1,207 @@
+import queue
+import threading
+from time import monotonic, sleep
+from typing import Any, NamedTuple
+
+
+class RateLimiter:
+    """Spaces out calls made from any number of threads so that, together,
+    they don't go over the given amount of calls per second.
+
+    Arguments:
+        per_second {int or float} -- Maximum amount of calls per second, a
+        value of 0 disables the limit.
+    """
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        """Blocks the calling thread until it is allowed to make its call."""
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = monotonic()
+            call_at = max(now, self._next_call)
+            self._next_call = call_at + self.interval
+
+        if call_at > now:
+            sleep(call_at - now)
+
+
+class PipelineResult(NamedTuple):
+    """Outcome of an item that went through `run_pipeline`.
+
+    Attributes:
+        item {Any} -- The item itself.
+        stage {str} -- Last stage the item went through, either "check" or
+        "download".
+        result {Any} -- Value returned by the check stage.
+        output {Any} -- Value returned by the download stage.
+        error {Exception} -- Exception raised by the last stage, if any.
+    """
+
+    item: Any
+    stage: str
+    result: Any = None
+    output: Any = None
+    error: Exception = None
+
+
+_STOP = object()
+
+
+def _start_thread(target) -> threading.Thread:
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_pipeline(
+    items,
+    check,
+    download=None,
+    *,
+    check_jobs=1,
+    download_jobs=1,
+    queue_size=0,
+    ordered=True,
+):
+    """Runs the check stage over every item and passes the ones that need it to
+    the download stage, each stage with its own pool of threads.
+
+    Both stages are connected by a queue that holds at most queue_size items,
+    so checks only wait on downloads when that many are already pending.
+
+    Items are taken from items as the check threads get to them, so it can be
+    a generator that isn't done producing them yet. It is only ever advanced by
+    one thread at a time.
+
+    Arguments:
+        items {Iterable} -- Items to go through the pipeline.
+        check {Callable} -- Called with an item, returns a tuple of its result
+        and whether or not the item has to go through the download stage.
+
+    Keyword Arguments:
+        download {Callable} -- Called with an item and its check result. If not
+        given, every item stops at the check stage. (default: {None})
+        check_jobs {int} -- Threads running the check stage. (default: {1})
+        download_jobs {int} -- Threads running the download stage.
+        (default: {1})
+        queue_size {int} -- Maximum amount of items waiting to be downloaded,
+        0 for no limit. (default: {0})
+        ordered {bool} -- Whether or not to yield the outcomes in the same
+        order as items, instead of as soon as each of them is done.
+        (default: {True})
+
+    Yields:
+        PipelineResult -- Outcome of every item.
+    """
+    cancelled = threading.Event()
+
+    pending = enumerate(items)
+    pending_lock = threading.Lock()
+    taken = 0
+    # Amount of items there were, only known once items is exhausted, along
+    # with the exception raised by items, if any.
+    total = None
+    items_error = None
+
+    to_download = queue.Queue(maxsize=queue_size)
+    finished = queue.Queue()
+
+    def take_item():
+        nonlocal taken, total, items_error
+
+        with pending_lock:
+            if total is not None:
+                return None
+
+            try:
+                entry = next(pending)
+            except Exception as err:
+                if not isinstance(err, StopIteration):
+                    items_error = err
+                total = taken
+                # Wakes up the loop below in case it is waiting on nothing.
+                finished.put((None, None))
+                return None
+
+            taken += 1
+            return entry
+
+    def check_worker():
+        while not cancelled.is_set():
+            entry = take_item()
+            if entry is None:
+                return
+            index, item = entry
+
+            try:
+                result, wanted = check(item)
+            except Exception as err:
+                finished.put((index, PipelineResult(item, "check", error=err)))
+                continue
+
+            if wanted and download is not None:
+                to_download.put((index, item, result))
+            else:
+                finished.put((index, PipelineResult(item, "check", result)))
+
+    def download_worker():
+        while True:
+            entry = to_download.get()
+            if entry is _STOP:
+                return
+
+            index, item, result = entry
+            try:
+                output = download(item, result)
+            except Exception as err:
+                outcome = PipelineResult(item, "download", result, error=err)
+            else:
+                outcome = PipelineResult(item, "download", result, output)
+            finished.put((index, outcome))
+
+    check_threads = [_start_thread(check_worker) for _ in range(max(1, check_jobs))]
+    download_threads = (
+        [_start_thread(download_worker) for _ in range(max(1, download_jobs))]
+        if download is not None
+        else []
+    )
+
+    def stop_download_workers():
+        for thread in check_threads:
+            thread.join()
+        for _ in download_threads:
+            to_download.put(_STOP)
+
+    _start_thread(stop_download_workers)
+
+    # Outcomes arrive in whatever order the stages finish them, so when ordered
+    # they are held back until every item before them has been yielded.
+    done = {}
+    # Amount of outcomes yielded, which is also the index of the next one when
+    # ordered.
+    index = 0
+    try:
+        while True:
+            if not ordered and done:
+                yield done.popitem()[1]
+                index += 1
+            elif index in done:
+                yield done.pop(index)
+                index += 1
+            elif total is not None and index >= total:
+                if items_error is not None:
+                    raise items_error
+                return
+            else:
+                finished_index, outcome = finished.get()
+                if finished_index is not None:
+                    done[finished_index] = outcome
+    finally:
+        cancelled.set()
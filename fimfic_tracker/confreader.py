@@ -1,8 +1,11 @@
 import os
+import pickle
 import sys
+import tempfile
 from pathlib import Path
 
-from .constants import DOWNLOAD_URL_BY_FORMAT, VALID_ECHO_COLORS
+from .__version__ import __version__
+from .constants import CONFIG_CACHE_FILE, DOWNLOAD_URL_BY_FORMAT, VALID_ECHO_COLORS
 
 
 class ConfigValue:
@@ -36,14 +39,42 @@ class ConfigValue:
 CONFIG_VALUES = [
     ConfigValue(name="download_dir", valid_types=Path),
     ConfigValue(name="tracker_file", valid_types=Path),
+    ConfigValue(
+        name="tracker_backend", valid_types=str, valid_values=["json", "sqlite"]
+    ),
+    ConfigValue(name="cache_dir", valid_types=Path),
+    ConfigValue(name="content_store_dir", valid_types=Path),
+    ConfigValue(name="shard_results_dir", valid_types=Path),
+    ConfigValue(name="tracker_flush_every", valid_types=int),
+    ConfigValue(name="tracker_flush_interval", valid_types=(int, float)),
+    ConfigValue(name="tracker_lock_timeout", valid_types=(int, float)),
     ConfigValue(
         name="download_format",
         valid_types=str,
         valid_values=DOWNLOAD_URL_BY_FORMAT.keys(),
     ),
     ConfigValue(name="download_delay", valid_types=(int, float)),
+    ConfigValue(name="download_incremental", valid_types=bool),
     ConfigValue(name="download_alt", valid_types=list),
     ConfigValue(name="download_alt_quiet", valid_types=bool),
+    ConfigValue(name="download_alt_log_dir", valid_types=Path),
+    ConfigValue(name="download_alt_concurrency", valid_types=int),
+    ConfigValue(name="download_alt_timeout", valid_types=(int, float)),
+    ConfigValue(name="progress_refresh_interval", valid_types=(int, float)),
+    ConfigValue(name="check_concurrency", valid_types=int),
+    ConfigValue(name="download_concurrency", valid_types=int),
+    ConfigValue(name="download_queue_size", valid_types=int),
+    ConfigValue(name="max_requests_per_second", valid_types=(int, float)),
+    ConfigValue(name="fimfic_base_url", valid_types=str),
+    ConfigValue(name="connect_timeout", valid_types=(int, float)),
+    ConfigValue(name="read_timeout", valid_types=(int, float)),
+    ConfigValue(name="request_retries", valid_types=int),
+    ConfigValue(name="request_backoff", valid_types=(int, float)),
+    ConfigValue(name="story_cache", valid_types=bool),
+    ConfigValue(name="story_cache_ttl", valid_types=(int, float)),
+    ConfigValue(name="check_min_interval", valid_types=(int, float)),
+    ConfigValue(name="check_max_interval", valid_types=(int, float)),
+    ConfigValue(name="check_inactive_interval", valid_types=(int, float)),
 ]
 
 CONFIG_VALUES.extend(
@@ -104,11 +135,79 @@ def import_config(filepath: Path) -> dict:
     return parsed_config
 
 
+def get_config_cache_key(config_path_list: list) -> tuple:
+    """Returns a key that changes whenever any of the given configuration files,
+    or the way they are read, changes.
+
+    Arguments:
+        config_path_list {List[Path]} -- List of paths to python configuration
+        files.
+
+    Returns:
+        tuple -- Path, modification time and size of every file, None for the
+        last two if it doesn't exist.
+    """
+    key = [__version__]
+
+    for filepath in [Path(__file__), *config_path_list]:
+        try:
+            st = filepath.stat()
+        except FileNotFoundError:
+            key.append((str(filepath), None, None))
+        else:
+            key.append((str(filepath), st.st_mtime_ns, st.st_size))
+
+    return tuple(key)
+
+
+def read_config_cache(key: tuple) -> dict:
+    """Returns the configuration cached under the given key.
+
+    Arguments:
+        key {tuple} -- Key from `get_config_cache_key`.
+
+    Returns:
+        dict -- Mapping of the configuration, None if it isn't cached.
+    """
+    try:
+        with CONFIG_CACHE_FILE.open("rb") as f:
+            cached_key, config = pickle.load(f)
+    except Exception:
+        return None
+
+    return config if cached_key == key else None
+
+
+def write_config_cache(key: tuple, config: dict):
+    """Caches the configuration under the given key, replacing any other. Fails
+    silently, as the cache is only there to speed up loading.
+
+    Arguments:
+        key {tuple} -- Key from `get_config_cache_key`.
+        config {dict} -- Mapping of the configuration.
+    """
+    try:
+        CONFIG_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CONFIG_CACHE_FILE.parent, suffix=".tmp")
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, config), f)
+        os.replace(tmp_path, CONFIG_CACHE_FILE)
+    except Exception:
+        os.unlink(tmp_path)
+
+
 def load_config(config_path_list: list) -> dict:
     """Load the given list of paths in order of reverse priority, where the
     values get overwritten by any other before them if defined, and returns
     the resulting configuration.
 
+    The result is cached and reused, without importing nor validating any file,
+    for as long as none of the files are created, modified or deleted.
+
     Arguments:
         config_path_list {List[Path]} -- List of paths to python configuration
         files.
@@ -116,9 +215,15 @@ def load_config(config_path_list: list) -> dict:
     Returns:
         dict -- Resulting mapping of the configuration.
     """
+    key = get_config_cache_key(config_path_list)
+    config = read_config_cache(key)
+    if config is not None:
+        return config
+
     config = {}
 
     for filepath in filter(lambda p: p.exists(), config_path_list):
         config.update(**import_config(filepath))
 
+    write_config_cache(key, config)
     return config
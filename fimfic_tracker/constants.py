@@ -2,16 +2,39 @@ from enum import Enum
 from pathlib import Path
 
 FIMFIC_BASE_URL = "https://www.fimfiction.net"
-FIMFIC_STORY_API_URL = FIMFIC_BASE_URL + "/api/story.php"
+FIMFIC_STORY_API_PATH = "/api/story.php"
+FIMFIC_STORY_API_URL = FIMFIC_BASE_URL + FIMFIC_STORY_API_PATH
 FIMFIC_STORY_URL_REGEX = r"https?://(?:www.)?fimfiction.net/story/(?P<STORY_ID>\d+)"
 
-KEYWORDS_TO_HIDE_ON_LIST = ["last-update-timestamp", "completion-status"]
+KEYWORDS_TO_HIDE_ON_LIST = [
+    "last-update-timestamp",
+    "completion-status",
+    "update-history",
+    "last-check-timestamp",
+    "content-digest",
+    "content-size",
+]
+# Story mapping keys saved from a check that didn't find an update, as they can
+# change without the story updating. The rest stay as they were on the last
+# download, for `funcs.has_an_update` to compare against.
+CHECK_REFRESH_KEYS = ["title", "author", "completion-status"]
+# Story mapping keys compared by the check command.
+STORY_DIFF_KEYS = ["words", "chapter-amt", "last-update-timestamp", "completion-status"]
 # Doesn't seem like these URLs will change anytime soon if not never.
 # So hardcoded they are!
-DOWNLOAD_URL_BY_FORMAT = {
-    extension: FIMFIC_BASE_URL + "/story/download/{STORY_ID}/" + extension
+DOWNLOAD_PATH_BY_FORMAT = {
+    extension: "/story/download/{STORY_ID}/" + extension
     for extension in ("txt", "html", "epub")
 }
+# Only the text formats can be downloaded by chapter.
+CHAPTER_DOWNLOAD_PATH_BY_FORMAT = {
+    extension: "/chapters/download/{CHAPTER_ID}/" + extension
+    for extension in ("txt", "html")
+}
+DOWNLOAD_URL_BY_FORMAT = {
+    extension: FIMFIC_BASE_URL + path
+    for extension, path in DOWNLOAD_PATH_BY_FORMAT.items()
+}
 
 CONFIG_FILE_LOCATIONS = [
     Path(__file__).parent.absolute() / "default_config.py",
@@ -19,6 +42,9 @@ CONFIG_FILE_LOCATIONS = [
     Path.home() / ".fimfic-tracker" / "settings.py",
 ]
 
+# Where the configuration loaded from the files above is cached.
+CONFIG_CACHE_FILE = Path.home() / ".cache" / "fimfic-tracker" / "config.pickle"
+
 # https://click.palletsprojects.com/en/7.x/api/#click.style
 VALID_ECHO_COLORS = [
     "black",
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+
+class ContentStore:
+    """Directory of downloaded files named after the SHA-256 digest of their
+    content, so that identical files are only stored once and hardlinked to
+    wherever they were downloaded to.
+
+    It has to be on the same filesystem as the download directory, otherwise
+    files are saved as usual.
+
+    Arguments:
+        directory {Path} -- Directory in which to keep the files.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest
+
+    def save(self, source: Path, digest: str, path: Path):
+        """Moves the source file to path through the store, reusing the stored
+        file of the same content if there is one.
+
+        Arguments:
+            source {Path} -- File to save, removed afterwards.
+            digest {str} -- SHA-256 hex digest of the file.
+            path {Path} -- Where to leave the hardlink to the stored file.
+        """
+        stored = self._path(digest)
+        stored.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            try:
+                os.link(source, stored)
+            except FileExistsError:
+                # Linked to a temporary name first, as os.link won't replace
+                # path if it already exists.
+                link_path = path.with_name(path.name + ".link")
+                if link_path.exists():
+                    link_path.unlink()
+                os.link(stored, link_path)
+                os.replace(link_path, path)
+                source.unlink()
+                return
+        except OSError:
+            # Most likely a different filesystem, where hardlinks can't go.
+            pass
+
+        os.replace(source, path)
+
+
+def get_content_store(config: dict) -> ContentStore:
+    """Returns the content store at content_store_dir.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Returns:
+        ContentStore -- The store, None if content_store_dir isn't set.
+    """
+    directory = config.get("content_store_dir")
+    return ContentStore(directory) if directory is not None else None
@@ -9,6 +9,50 @@ download_dir = Path.home() / ".fimfic-tracker" / "downloads"
 # Type: Path
 tracker_file = Path.home() / ".fimfic-tracker" / "track-data.json"
 
+# How to store the tracking list on the tracker file. The valid values are:
+# + "json" - Loaded whole into memory and rewritten whole on every change.
+# + "sqlite" - A SQLite database from which only the needed stories are read,
+#   better suited for big tracking lists. Remember to change tracker_file as
+#   well, e.g. to "track-data.sqlite3".
+# An existing tracking list can be moved to another backend with the import
+# command.
+# Type: str
+tracker_backend = "json"
+
+# The amount of changes to the tracking list after which to write it to the
+# tracker file, and the seconds after which to write it if it has any change.
+# Pending changes are always written once a command finishes or gets
+# interrupted. 0 disables either of them.
+# Unless uncommented, the "json" backend only writes on the interval, as every
+# write rewrites the whole file, and the "sqlite" one every 100 changes.
+# Type: int
+# tracker_flush_every = 100
+# Type: int or float
+tracker_flush_interval = 30
+
+# Seconds to wait for another process writing to the tracker file to finish,
+# before giving up on writing to it. Processes only write the stories they
+# changed, so several of them can use the same tracking list at once. 0 waits
+# for as long as it takes.
+# Type: int or float
+tracker_lock_timeout = 60
+
+# Path to a directory in which to keep cached data.
+# Type: Path
+cache_dir = Path.home() / ".fimfic-tracker" / "cache"
+
+# If uncommented, downloaded stories are kept inside of this directory under
+# the SHA-256 digest of their content, and hardlinked to download_dir. So that
+# identical files, like a story tracked again under another ID, are only stored
+# once. It has to be on the same filesystem as download_dir.
+# Type: Path
+# content_store_dir = Path.home() / ".fimfic-tracker" / "store"
+
+# Path to a directory in which "download --shard" saves what it would save to
+# the tracking list, one file per shard, until the merge command saves it.
+# Type: Path
+shard_results_dir = Path.home() / ".fimfic-tracker" / "shards"
+
 # --- Download
 # The format in which to download the stories. The valid values are:
 # + "txt"
@@ -17,10 +61,17 @@ tracker_file = Path.home() / ".fimfic-tracker" / "track-data.json"
 # Type: str
 download_format = "html"
 
-# The seconds to wait before advancing to the next story.
+# The seconds to wait after downloading a story before downloading the next one.
 # Type: int or float
 download_delay = 1
 
+# Whether or not to download only the chapters that are new or changed since
+# the last download of a story, instead of the whole story. The chapters are
+# kept inside of cache_dir and put together into the story file. Only works
+# with the "txt" and "html" formats, and doesn't apply to download_alt.
+# Type: bool
+download_incremental = False
+
 # If uncommented, this will be excuted as a command in the download process
 # instead of directly downloading from Fimfiction.
 # The command has to be given as a list of arguments, each of them can contain
@@ -80,6 +131,99 @@ download_delay = 1
 # Type: bool
 download_alt_quiet = True
 
+# If uncommented, the output of the command defined in download_alt is saved
+# to a "<story id>.log" file inside of this directory instead, overwritten on
+# every download.
+# Type: Path
+# download_alt_log_dir = Path.home() / ".fimfic-tracker" / "logs"
+
+# The maximum amount of commands defined in download_alt to run at the same
+# time. The commands are run by the download threads, so no more than
+# download_concurrency of them run at once either.
+# Type: int
+download_alt_concurrency = 2
+
+# The seconds after which a command defined in download_alt is killed,
+# counting it as failed. 0 disables the limit.
+# Type: int or float
+download_alt_timeout = 10 * 60
+
+# The minimum seconds between redraws of the download progress. Progress is
+# only shown when the output is a terminal.
+# Type: int or float
+progress_refresh_interval = 0.1
+
+# --- Concurrency
+# The amount of stories to check for updates at the same time on the download
+# command. Can be overridden with its "--jobs" option.
+# Type: int
+check_concurrency = 4
+
+# The amount of stories to download at the same time on the download command,
+# separately from the ones being checked. Can be overridden with its
+# "--download-jobs" option.
+# Type: int
+download_concurrency = 2
+
+# The maximum amount of stories with an update that can be waiting for a
+# download slot. Checks pause once it is reached. 0 removes the limit.
+# Type: int
+download_queue_size = 16
+
+# --- Requests
+# Where the story data and downloads are requested from. Only worth changing to
+# point to a mirror of Fimfiction or to a local server, like the one used by
+# the benchmarks.
+# Type: str
+fimfic_base_url = "https://www.fimfiction.net"
+
+# The maximum amount of requests to make to Fimfiction per second, shared
+# between every story being checked or downloaded at the same time. 0 disables
+# the limit.
+# The processes of "download --processes" split it between them, but every
+# "--shard" run started by hand, like on separate hosts, uses all of it. Lower
+# it on their settings so that all of them together stay under the limit.
+# Type: int or float
+max_requests_per_second = 5
+
+# The seconds to wait for a connection to Fimfiction to be established, and
+# for it to send any data once connected, before giving up on a request.
+# Type: int or float
+connect_timeout = 10
+read_timeout = 60
+
+# The amount of times to retry a request that failed due to a connection error
+# or a server error (5xx status), waiting longer between each retry. The wait
+# is request_backoff * (2 ** (retry number - 1)) seconds.
+# Type: int
+request_retries = 3
+# Type: int or float
+request_backoff = 0.5
+
+# Whether or not to keep the last data obtained from every story inside of
+# cache_dir. When enabled, Fimfiction is asked to only send the data of a story
+# if it changed since it was cached.
+# Type: bool
+story_cache = True
+
+# The seconds in which the cached data of a story is used as is, without
+# asking Fimfiction at all. 0 always asks.
+# Type: int or float
+story_cache_ttl = 0
+
+# --- Scheduling
+# Used by "download --due-only" to check each story only as often as it tends
+# to be updated. The seconds between checks of an incomplete story follow the
+# median time between its last updates, kept between these two bounds.
+# Type: int or float
+check_min_interval = 60 * 60
+check_max_interval = 14 * 24 * 60 * 60
+
+# The seconds between checks of stories marked as complete, on hiatus or
+# cancelled, which are then checked without asking for confirmation.
+# Type: int or float
+check_inactive_interval = 60 * 24 * 60 * 60
+
 # --- Colors
 # The color to use for text in certain output. The list of valid values can be
 # found at: https://click.palletsprojects.com/en/7.x/api/#click.style
@@ -10,3 +10,11 @@ class RequestError(DownloadError):
 
 class CommandError(DownloadError):
     pass
+
+
+class QueryError(ValueError):
+    pass
+
+
+class TrackerLockError(Exception):
+    pass
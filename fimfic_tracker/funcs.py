@@ -1,24 +1,53 @@
-import subprocess
+import os
+import stat
+import tempfile
 from datetime import datetime
 from json import dump as json_dump
+from pathlib import Path
 
 import click
-import requests
 
+from .cache import get_story_cache
 from .constants import (
+    CHAPTER_DOWNLOAD_PATH_BY_FORMAT,
     CHARACTER_CONVERSION,
-    DOWNLOAD_URL_BY_FORMAT,
-    FIMFIC_STORY_API_URL,
+    DOWNLOAD_PATH_BY_FORMAT,
+    FIMFIC_STORY_API_PATH,
+    STORY_DIFF_KEYS,
     ConfirmState,
     StoryStatus,
 )
 from .exceptions import CommandError, RequestError
+from .records import to_json
+from .runner import CommandResult, get_result_str
+from .stats import get_stats
 
 
-def get_story_data(story_id: str, config: dict, *, do_echoes=True) -> dict:
+class StoryData(dict):
+    """Story mapping that also carries the chapter manifest of the story, kept
+    apart from its keys so that it doesn't end up on the tracking list.
+
+    Arguments:
+        data {dict} -- The story mapping.
+
+    Keyword Arguments:
+        chapters {List[dict]} -- Chapter manifest, None if unknown.
+        (default: {None})
+    """
+
+    def __init__(self, data: dict, *, chapters: list = None):
+        super().__init__(data)
+        self.chapters = chapters
+
+
+def get_story_data(story_id: str, config: dict, *, do_echoes=True) -> StoryData:
     """Makes a request to the given Fimfiction story ID and extracts relevant
     data out of it.
 
+    If the story cache is enabled, the request is made conditional on the data
+    having changed since it was cached, or skipped altogether while the cached
+    data is still within story_cache_ttl.
+
     Arguments:
         story_id {str} -- ID of the story to get the data from.
         config {dict} -- Config mapping loaded from `confreader.load_config`.
@@ -27,13 +56,16 @@ def get_story_data(story_id: str, config: dict, *, do_echoes=True) -> dict:
         do_echoes {bool} -- (default: {True})
 
     Returns:
-        dict -- Story mapping of the following keys:
+        StoryData -- Story mapping of the following keys:
             - `title` {str} -- Title of the story.
             - `author` {str} -- Name of the author of the story.
             - `chapter-amt` {int} -- Amount of chapters the story has.
             - `words` {int} -- Amount of words the story has.
             - `last-update-timestamp` {float} -- Timestamp of the last update.
             - `completion-status` {int} -- StoryStatus enum value.
+        With its chapters attribute as a list of mappings of the keys `id`,
+        `title`, `words` and `date-modified` of every chapter, only when
+        download_incremental is enabled.
     """
     if do_echoes:
         click.secho(
@@ -41,17 +73,78 @@ def get_story_data(story_id: str, config: dict, *, do_echoes=True) -> dict:
             fg=config["info_fg_color"],
         )
 
-    req = requests.get(FIMFIC_STORY_API_URL, params={"story": story_id})
-    story_data = req.json()["story"]
+    stats = get_stats()
+    cache = get_story_cache(config)
+    entry = cache.get(story_id) if cache else None
+    if config["download_incremental"] and entry and entry.get("chapters") is None:
+        # Cached while the chapters weren't needed, so they weren't kept.
+        entry = None
+    if entry is not None and cache.is_fresh(entry):
+        stats.count("story_cache_hits")
+        return StoryData(entry["data"], chapters=entry.get("chapters"))
+
+    # Imported here to not pay for them on commands that don't make requests.
+    import requests
+
+    from .client import get_client
+
+    with stats.timed("api_request"):
+        req = get_client(config).get(
+            config["fimfic_base_url"] + FIMFIC_STORY_API_PATH,
+            params={"story": story_id},
+            headers=cache.conditional_headers(entry) if entry else None,
+        )
+    stats.count("api_bytes", len(req.content))
 
-    return {
-        "title": story_data["title"],
-        "author": story_data["author"]["name"],
-        "chapter-amt": len(story_data["chapters"]),
-        "words": story_data["words"],
-        "last-update-timestamp": story_data["date_modified"],
-        "completion-status": StoryStatus.get_enum_from(story_data["status"]),
-    }
+    if req.status_code == 304 and entry is not None:
+        stats.count("story_cache_hits")
+        cache.touch(story_id)
+        return StoryData(entry["data"], chapters=entry.get("chapters"))
+
+    try:
+        req.raise_for_status()
+    except requests.HTTPError as err:
+        raise RequestError(err)
+
+    try:
+        response = req.json()
+        if "story" not in response:
+            # Like for stories that were deleted.
+            raise ValueError(response.get("error", "There is no story on it."))
+        story_data = response["story"]
+
+        # The chapters are only needed for incremental downloads, otherwise
+        # they are just counted.
+        chapters = None
+        if config["download_incremental"]:
+            chapters = [
+                {
+                    "id": chapter["id"],
+                    "title": chapter["title"],
+                    "words": chapter["words"],
+                    "date-modified": chapter["date_modified"],
+                }
+                for chapter in story_data["chapters"]
+            ]
+
+        data = {
+            "title": story_data["title"],
+            "author": story_data["author"]["name"],
+            "chapter-amt": len(story_data["chapters"]),
+            "words": story_data["words"],
+            "last-update-timestamp": story_data["date_modified"],
+            "completion-status": StoryStatus.get_enum_from(story_data["status"]),
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as err:
+        raise RequestError(
+            f"Unexpected response from the API for the story of ID {story_id}: "
+            f"{err}"
+        )
+
+    if cache:
+        cache.put(story_id, data, req.headers, chapters=chapters)
+
+    return StoryData(data, chapters=chapters)
 
 
 def has_an_update(page_data: dict, tracker_data: dict) -> bool:
@@ -72,6 +165,32 @@ def has_an_update(page_data: dict, tracker_data: dict) -> bool:
     return False
 
 
+def get_story_diff(page_data: dict, tracker_data: dict) -> dict:
+    """Compares two story mappings of the same story on the keys of
+    STORY_DIFF_KEYS.
+
+    Arguments:
+        page_data {dict} -- Requested story mapping, from `get_story_data`.
+        tracker_data {dict} -- Story mapping from the tracked list.
+
+    Returns:
+        dict -- Mapping of the following keys:
+            - `updated` {bool} -- Whether or not there was an update, as given
+            by `has_an_update`.
+            - `changed` {List[str]} -- Keys that have a different value.
+            - `old` {dict} -- Values of the keys on tracker_data.
+            - `new` {dict} -- Values of the keys on page_data.
+    """
+    old = {key: tracker_data[key] for key in STORY_DIFF_KEYS}
+    new = {key: page_data[key] for key in STORY_DIFF_KEYS}
+    return {
+        "updated": has_an_update(page_data, tracker_data),
+        "changed": [key for key in STORY_DIFF_KEYS if old[key] != new[key]],
+        "old": old,
+        "new": new,
+    }
+
+
 def get_size_str_from_bytes(size_bytes: int) -> str:
     """Returns a human readable representation of given bytes.
 
@@ -90,24 +209,7 @@ def get_size_str_from_bytes(size_bytes: int) -> str:
     return f"{size_bytes:.2f} {suffix}"
 
 
-def ljust_column_print(message: str, **kwargs):
-    """Prints given message left-justified to terminal column size.
-
-    Arguments:
-        message {str} -- Message to print.
-
-    Keyword Arguments:
-        fg {str} -- Foreground to give to message with the click.style function.
-        kwargs -- Keyword arguments to use on print.
-    """
-    fg = kwargs.pop("fg")
-    if fg:
-        message = click.style(message, fg=fg)
-
-    print(message.ljust(click.get_terminal_size()[0] - 1), **kwargs)
-
-
-def download_story(story_id: str, story_data: dict, config: dict):
+def download_story(story_id: str, story_data: dict, config: dict, *, do_echoes=True):
     """Download the story in one of the official formats, specified inside of
     config, to the download directory given its ID and data.
 
@@ -124,8 +226,16 @@ def download_story(story_id: str, story_data: dict, config: dict):
         story_id {dict} -- The ID of the story to download.
         story_data {dict} -- Data of the story to download.
         config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        do_echoes {bool} -- (default: {True})
+
+    Returns:
+        DownloadResult or CommandResult -- Where the story was saved to, or
+        the outcome of the command if download_alt was used.
     """
     download_dir = config["download_dir"]
+    download_dir.mkdir(parents=True, exist_ok=True)
     download_alt = config.get("download_alt")
 
     def make_safe_for_filename(string):
@@ -154,50 +264,122 @@ def download_story(story_id: str, story_data: dict, config: dict):
             )
             raise ValueError(msg)
 
-        click.secho(
-            "Executing: " + " ".join(map(lambda s: f'"{s}"' if " " in s else s, cmd)),
-            fg=config["info_fg_color"],
-        )
+        if do_echoes:
+            click.secho(
+                "Executing: "
+                + " ".join(map(lambda s: f'"{s}"' if " " in s else s, cmd)),
+                fg=config["info_fg_color"],
+            )
 
-        kwargs = (
-            {}
-            if not config["download_alt_quiet"]
-            else {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
-        )
-        proc = subprocess.run(cmd, **kwargs)
+        from .runner import run_command
 
-        returncode = proc.returncode
-        if returncode:
-            raise CommandError(f"Command failed, exited with code {returncode}.")
+        log_dir = config.get("download_alt_log_dir")
+        with get_stats().timed("download_alt"):
+            result = run_command(
+                cmd,
+                config,
+                log_path=log_dir / f"{story_id}.log" if log_dir else None,
+                quiet=config["download_alt_quiet"],
+            )
 
-        click.secho("Command finished successfully.", fg=config["success_fg_color"])
-        return
+        if result.timed_out:
+            msg = f"Command killed after running for {result.wall_time:.2f}s."
+        elif result.returncode:
+            msg = f"Command failed, exited with code {result.returncode}."
+        else:
+            msg = None
+
+        if msg is not None:
+            if result.log_path is not None:
+                msg += f' Its output was saved to "{result.log_path}".'
+            raise CommandError(msg)
+
+        if do_echoes:
+            click.secho(
+                f"Command finished successfully in {get_result_str(result)}.",
+                fg=config["success_fg_color"],
+            )
+        return result
+
+    from .client import get_client
+    from .contentstore import get_content_store
+    from .progress import get_progress
 
     dl_format = config["download_format"]
 
-    download_url = DOWNLOAD_URL_BY_FORMAT[dl_format].format(STORY_ID=story_id)
+    download_url = config["fimfic_base_url"] + DOWNLOAD_PATH_BY_FORMAT[
+        dl_format
+    ].format(STORY_ID=story_id)
     filename = make_safe_for_filename(story_data["title"] + "." + dl_format)
-    downloaded_bytes = 0
+    progress = get_progress(config)
+
+    def on_progress(size, total):
+        progress.update(filename, size, total)
 
     try:
-        # From: https://stackoverflow.com/a/16696317
-        with requests.get(download_url, stream=True) as r:
-            r.raise_for_status()
-            with open(download_dir / filename, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    downloaded_bytes += len(chunk)
-
-                    ljust_column_print(
-                        f'Downloading "{filename}" [{get_size_str_from_bytes(downloaded_bytes)}]',
-                        fg=config["info_fg_color"],
-                        flush=True,
-                        end="\r",
-                    )
-    except requests.ConnectionError as err:
-        raise RequestError(err)
+        with get_stats().timed("download"):
+            if (
+                config["download_incremental"]
+                and dl_format in CHAPTER_DOWNLOAD_PATH_BY_FORMAT
+                and getattr(story_data, "chapters", None) is not None
+            ):
+                from .chapters import download_chapters
+
+                result = download_chapters(
+                    story_id,
+                    story_data,
+                    download_dir / filename,
+                    config,
+                    on_progress=on_progress,
+                )
+            else:
+                result = get_client(config).download(
+                    download_url,
+                    download_dir / filename,
+                    on_progress=on_progress,
+                    content_store=get_content_store(config),
+                )
+    finally:
+        progress.finish(filename)
+
+    if do_echoes:
+        click.secho(get_saved_str(result), fg=config["success_fg_color"])
+
+    return result
 
-    ljust_column_print(f'Saved as "{filename}"', fg=config["success_fg_color"])
+
+def get_saved_str(output) -> str:
+    """Returns the message telling how a story was saved.
+
+    Arguments:
+        output {DownloadResult or CommandResult} -- Value returned by
+        `download_story`.
+
+    Returns:
+        str -- The message.
+    """
+    if isinstance(output, CommandResult):
+        return f"Command finished successfully in {get_result_str(output)}."
+    if output.unchanged:
+        return f'Content didn\'t change, kept "{output.path.name}" as is.'
+    return f'Saved as "{output.path.name}"'
+
+
+def get_content_data(output) -> dict:
+    """Returns the keys to save on the story mapping about the downloaded file.
+
+    Arguments:
+        output {DownloadResult or CommandResult} -- Value returned by
+        `download_story`.
+
+    Returns:
+        dict -- Empty if download_alt was used, otherwise of the following keys:
+            - `content-digest` {str} -- SHA-256 hex digest of the file.
+            - `content-size` {int} -- Size of the file in bytes.
+    """
+    if isinstance(output, CommandResult):
+        return {}
+    return {"content-digest": output.digest, "content-size": output.size}
 
 
 def get_date_from_timestamp(timestamp: float) -> str:
@@ -216,12 +398,58 @@ def get_date_from_timestamp(timestamp: float) -> str:
 def save_to_track_file(data: dict, config: dict):
     """Save given data to the track file.
 
+    The data is written to a temporary file next to it, which then replaces the
+    track file. So that it is never left partially written.
+
     Arguments:
         data {dict} -- Data to save to the track file.
         config {dict} -- Config mapping loaded from `confreader.load_config`.
     """
-    with config["tracker_file"].open("w", encoding="utf-8") as f:
-        json_dump(data, f, ensure_ascii=False, indent=2)
+    tracker_file = config["tracker_file"]
+    try:
+        mode = stat.S_IMODE(tracker_file.stat().st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=tracker_file.parent, prefix=f".{tracker_file.name}.", suffix=".tmp"
+    )
+
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json_dump(data, f, ensure_ascii=False, indent=2, default=to_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, tracker_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    fsync_dir(tracker_file.parent)
+
+
+def fsync_dir(path: Path):
+    """Flushes the entries of the given directory to disk, making any rename
+    done inside of it durable. Does nothing where directories can't be opened,
+    like on Windows.
+
+    Arguments:
+        path {Path} -- Path to the directory.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 def get_highlighted_value(value, config: dict):
@@ -289,3 +517,9 @@ def confirm(confirm_state: ConfirmState, confirm_msg: str) -> bool:
         click.echo(f"{confirm_msg} [y/N]: N")
         return False
     return click.confirm(confirm_msg)
+
+
+def raise_system_exit(signum, frame):
+    """Signal handler that exits through a SystemExit exception, letting any
+    cleanup run on its way out."""
+    raise SystemExit(128 + signum)
@@ -0,0 +1,180 @@
+import json
+
+import click
+
+from .constants import KEYWORDS_TO_HIDE_ON_LIST, StoryStatus
+from .funcs import get_date_from_timestamp
+from .records import to_json
+
+LIST_FORMATS = ["text", "json", "ndjson", "tsv"]
+
+# Columns of the "tsv" format, after the story ID.
+TSV_COLUMNS = [
+    "title",
+    "author",
+    "chapter-amt",
+    "words",
+    "last-update-timestamp",
+    "completion-status",
+]
+SHORT_COLUMNS = ["title"]
+
+# Rendered stories are joined and written once they take at least this many
+# characters, instead of on every line.
+WRITE_BUFFER_SIZE = 64 * 1024
+
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _no_style(text: str, **kwargs) -> str:
+    return text
+
+
+def _iter_text(stories, config: dict, *, short: bool, styled: bool):
+    style = click.style if styled else _no_style
+
+    if short:
+        for story_id, tracker_data in stories:
+            yield "{0} {1}\n".format(
+                style(f"[{story_id}]", fg="bright_cyan"),
+                style(tracker_data["title"], fg=config["highlight_text_color"]),
+            )
+        return
+
+    # Styled once for the whole list instead of for every story.
+    key_strs = {}
+
+    def get_line(key, value):
+        k = key_strs.get(key)
+        if k is None:
+            k = key_strs[key] = style(key, fg="bright_white")
+
+        if isinstance(value, str):
+            fg = config["highlight_text_color"]
+        elif isinstance(value, (int, float)):
+            fg = config["highlight_number_color"]
+        else:
+            fg = config["highlight_other_color"]
+        return f"{k} = {style(str(value), fg=fg)}\n"
+
+    for story_id, tracker_data in stories:
+        lines = [
+            style(f"[ID {story_id}]", fg="bright_cyan") + "\n",
+            get_line(
+                "last-update-date",
+                get_date_from_timestamp(tracker_data["last-update-timestamp"]),
+            ),
+        ]
+        lines.extend(
+            get_line(key, value)
+            for key, value in tracker_data.items()
+            if key not in KEYWORDS_TO_HIDE_ON_LIST
+        )
+        lines.append(
+            get_line(
+                "completion-status",
+                StoryStatus.get_name_from(tracker_data["completion-status"]),
+            )
+        )
+        lines.append("\n")
+        yield "".join(lines)
+
+
+def _get_story_object(story_id: str, tracker_data, short: bool) -> dict:
+    if short:
+        return {"id": int(story_id), "title": tracker_data["title"]}
+    return {"id": int(story_id), **tracker_data}
+
+
+def _iter_json(stories, *, short: bool):
+    separator = "[\n"
+    for story_id, tracker_data in stories:
+        yield separator + json.dumps(
+            _get_story_object(story_id, tracker_data, short),
+            ensure_ascii=False,
+            default=to_json,
+        )
+        separator = ",\n"
+
+    yield "[]\n" if separator == "[\n" else "\n]\n"
+
+
+def _iter_ndjson(stories, *, short: bool):
+    for story_id, tracker_data in stories:
+        yield json.dumps(
+            _get_story_object(story_id, tracker_data, short),
+            ensure_ascii=False,
+            default=to_json,
+        ) + "\n"
+
+
+def _iter_tsv(stories, *, short: bool):
+    columns = SHORT_COLUMNS if short else TSV_COLUMNS
+    yield "\t".join(["id", *columns]) + "\n"
+
+    for story_id, tracker_data in stories:
+        yield "\t".join(
+            [
+                story_id,
+                *(
+                    str(tracker_data.get(column, "")).translate(_TSV_ESCAPES)
+                    for column in columns
+                ),
+            ]
+        ) + "\n"
+
+
+def iter_list_output(stories, list_format: str, config: dict, *, short=False):
+    """Renders the given stories of the tracking list in the given format,
+    piece by piece.
+
+    Styling is only applied on the "text" format, and only when the standard
+    output is a terminal.
+
+    Arguments:
+        stories {Iterable[Tuple[str, dict]]} -- Pairs of story ID and story
+        mapping to render.
+        list_format {str} -- One of LIST_FORMATS.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        short {bool} -- Whether or not to only render the ID and title of every
+        story. (default: {False})
+
+    Returns:
+        Iterator[str] -- The pieces of the output, in order.
+    """
+    if list_format == "text":
+        styled = click.get_text_stream("stdout").isatty()
+        return _iter_text(stories, config, short=short, styled=styled)
+    if list_format == "json":
+        return _iter_json(stories, short=short)
+    if list_format == "ndjson":
+        return _iter_ndjson(stories, short=short)
+    if list_format == "tsv":
+        return _iter_tsv(stories, short=short)
+    raise ValueError(f"Unknown list format: {list_format}")
+
+
+def write_buffered(pieces, stream=None):
+    """Writes the given pieces of text to stream in batches of at least
+    WRITE_BUFFER_SIZE characters, each of them with a single `click.echo`.
+
+    Arguments:
+        pieces {Iterable[str]} -- Text to write.
+
+    Keyword Arguments:
+        stream {TextIO} -- Where to write to. (default: {standard output})
+    """
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= WRITE_BUFFER_SIZE:
+            click.echo("".join(buffer), file=stream, nl=False)
+            buffer.clear()
+            size = 0
+
+    if buffer:
+        click.echo("".join(buffer), file=stream, nl=False)
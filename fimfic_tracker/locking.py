@@ -0,0 +1,71 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from time import monotonic, sleep
+
+from .exceptions import TrackerLockError
+
+try:
+    import fcntl
+except ImportError:
+    # On Windows, where msvcrt is available instead.
+    fcntl = None
+    import msvcrt
+
+# Seconds to wait between attempts to take a lock held by another process.
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def lock_file(path: Path, timeout: float = 0):
+    """Holds an exclusive advisory lock on the given lock file, created if it
+    doesn't exist, for the duration of the with block. Only processes that
+    take the same lock are kept out, along with other threads of this one.
+
+    Arguments:
+        path {Path} -- Path of the lock file.
+
+    Keyword Arguments:
+        timeout {float} -- Seconds to wait for another holder of the lock to
+        release it, 0 waits for as long as it takes. (default: {0})
+
+    Raises:
+        TrackerLockError -- If the lock couldn't be taken within timeout.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        deadline = monotonic() + timeout
+        while not _try_lock(fd):
+            if timeout and monotonic() >= deadline:
+                raise TrackerLockError(
+                    f'Gave up after {timeout} seconds waiting for "{path}" to be '
+                    "unlocked by another process."
+                )
+            sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
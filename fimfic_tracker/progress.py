@@ -0,0 +1,143 @@
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+import click
+
+from .funcs import get_size_str_from_bytes
+
+_progress = None
+_progress_lock = threading.Lock()
+
+
+class ProgressRenderer:
+    """Shows the combined progress of every download in progress on a single
+    line, redrawn at most once every refresh_interval seconds.
+
+    Nothing is shown when the stream isn't a terminal.
+
+    Arguments:
+        refresh_interval {float} -- Minimum seconds between redraws.
+
+    Keyword Arguments:
+        fg {str} -- Foreground to give to the line with the click.style
+        function. (default: {None})
+        stream {TextIO} -- Where to draw the line. (default: {sys.stdout})
+    """
+
+    def __init__(self, refresh_interval: float, *, fg=None, stream=None):
+        self.refresh_interval = refresh_interval
+        self.fg = fg
+        self.stream = stream or sys.stdout
+        self.enabled = self.stream.isatty()
+        # Asked only once, instead of on every redraw.
+        self.width = shutil.get_terminal_size().columns - 1
+
+        self._downloads = {}
+        self._lock = threading.Lock()
+        self._last_draw = 0.0
+        self._drawn = False
+        self._paused = 0
+
+    def update(self, name: str, downloaded_bytes: int, total_bytes: int = None):
+        """Sets the progress of the download of the given name.
+
+        Arguments:
+            name {str} -- Name of the download, usually its filename.
+            downloaded_bytes {int} -- Bytes downloaded so far.
+
+        Keyword Arguments:
+            total_bytes {int} -- Size of the download, if known.
+            (default: {None})
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._downloads[name] = (downloaded_bytes, total_bytes)
+
+            now = monotonic()
+            if not self._paused and now - self._last_draw >= self.refresh_interval:
+                self._last_draw = now
+                self._draw()
+
+    def finish(self, name: str):
+        """Stops showing the download of the given name.
+
+        Arguments:
+            name {str} -- Name of the download.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._downloads.pop(name, None)
+            self._clear()
+
+    @contextmanager
+    def paused(self):
+        """Clears the line and keeps it from being drawn, so that other output
+        can be printed without getting mixed up with it. Downloads keep
+        updating their progress meanwhile, it just isn't drawn."""
+        if not self.enabled:
+            yield
+            return
+
+        with self._lock:
+            self._paused += 1
+            self._clear()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._paused -= 1
+                # Forces the next update to draw the line back.
+                self._last_draw = 0.0
+
+    def _draw(self):
+        if not self._downloads:
+            return
+
+        downloaded = sum(d for d, _ in self._downloads.values())
+        totals = [t for _, t in self._downloads.values()]
+        size = get_size_str_from_bytes(downloaded)
+        if None not in totals:
+            size += " / " + get_size_str_from_bytes(sum(totals))
+
+        if len(self._downloads) == 1:
+            line = f'Downloading "{next(iter(self._downloads))}" [{size}]'
+        else:
+            line = f"Downloading {len(self._downloads)} stories [{size}]"
+
+        line = line[: self.width].ljust(self.width)
+        self.stream.write(click.style(line, fg=self.fg) + "\r")
+        self.stream.flush()
+        self._drawn = True
+
+    def _clear(self):
+        if self._drawn:
+            self.stream.write(" " * self.width + "\r")
+            self.stream.flush()
+            self._drawn = False
+
+
+def get_progress(config: dict) -> ProgressRenderer:
+    """Returns the progress renderer of this process, creating it on its first
+    call.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Returns:
+        ProgressRenderer -- The shared renderer.
+    """
+    global _progress
+
+    with _progress_lock:
+        if _progress is None:
+            _progress = ProgressRenderer(
+                config["progress_refresh_interval"], fg=config["info_fg_color"]
+            )
+        return _progress
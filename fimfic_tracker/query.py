@@ -0,0 +1,371 @@
+import heapq
+import re
+import shlex
+from bisect import bisect_left, bisect_right
+from time import time
+
+from .constants import StoryStatus
+from .exceptions import QueryError
+from .shards import get_shard
+
+# Names the stories can be sorted by, and the story mapping key of each. The ID
+# is sorted by as a number.
+SORT_KEYS = {
+    "id": None,
+    "title": "title",
+    "author": "author",
+    "chapters": "chapter-amt",
+    "words": "words",
+    "updated": "last-update-timestamp",
+    "status": "completion-status",
+}
+
+# Fields of a query that select by a range of numbers, and the story mapping
+# key each of them looks at.
+RANGE_FIELDS = {"words": "words", "chapters": "chapter-amt"}
+
+STATUS_NAMES = {
+    "complete": StoryStatus.completed,
+    "completed": StoryStatus.completed,
+    "incomplete": StoryStatus.incomplete,
+    "hiatus": StoryStatus.on_hiatus,
+    "on-hiatus": StoryStatus.on_hiatus,
+    "cancelled": StoryStatus.cancelled,
+    "canceled": StoryStatus.cancelled,
+}
+
+AGE_UNITS = {"h": 60 * 60, "d": 24 * 60 * 60, "w": 7 * 24 * 60 * 60}
+AGE_UNITS["y"] = 365 * AGE_UNITS["d"]
+
+_NUMBER_REGEX = re.compile(r"(?P<op><=|>=|<|>|=)?(?P<value>\d+)")
+_RANGE_REGEX = re.compile(r"(?P<min>\d*)\.\.(?P<max>\d*)")
+_AGE_REGEX = re.compile(r"(?P<value>\d+(?:\.\d+)?)(?P<unit>[hdwy])")
+
+
+def _parse_range(field: str, value: str) -> tuple:
+    match = _RANGE_REGEX.fullmatch(value)
+    if match:
+        low, high = match.group("min", "max")
+        return (int(low) if low else None, int(high) if high else None)
+
+    match = _NUMBER_REGEX.fullmatch(value)
+    if not match:
+        raise QueryError(
+            f'Invalid value for "{field}": {value!r}, expected a number like '
+            '"100", ">100", "<=100" or a range like "100..500".'
+        )
+
+    op, number = match.group("op"), int(match.group("value"))
+    return {
+        None: (number, number),
+        "=": (number, number),
+        ">": (number + 1, None),
+        ">=": (number, None),
+        "<": (None, number - 1),
+        "<=": (None, number),
+    }[op]
+
+
+def _parse_age(value: str) -> float:
+    match = _AGE_REGEX.fullmatch(value)
+    if not match:
+        raise QueryError(
+            f'Invalid age for "updated": {value!r}, expected a number followed '
+            'by "h", "d", "w" or "y", like "30d".'
+        )
+    return float(match.group("value")) * AGE_UNITS[match.group("unit")]
+
+
+def _parse_updated(value: str, now: float) -> dict:
+    # Ages count back from now, so being newer than an age means having been
+    # updated after the timestamp of that age.
+    if ".." in value:
+        newest, _, oldest = value.partition("..")
+        return {
+            "updated_after": now - _parse_age(oldest) if oldest else None,
+            "updated_before": now - _parse_age(newest) if newest else None,
+        }
+    if value[:1] == "<":
+        return {"updated_after": now - _parse_age(value.lstrip("<="))}
+    if value[:1] == ">":
+        return {"updated_before": now - _parse_age(value.lstrip(">="))}
+
+    raise QueryError(
+        f'Invalid value for "updated": {value!r}, expected an age like "<30d", '
+        '">1y" or a range of ages like "7d..30d".'
+    )
+
+
+def parse_query(expression: str, *, now: float = None) -> dict:
+    """Parses a query that selects stories of the tracking list, made of
+    whitespace separated terms which all have to match. Each of them being:
+        + status:NAME[,NAME...] -- complete, incomplete, hiatus or cancelled.
+        + author:NAME -- Quoted if it has spaces, e.g. author:"Some Author".
+        + words:N, chapters:N -- N being an amount like 100, >100 or <=100, or
+          a range like 100..500, 100.. or ..500.
+        + updated:AGE -- <30d for updated within the last 30 days, >1y for not
+          updated within the last year, or 7d..30d for in between. Ages are
+          given in h, d, w or y.
+
+    Arguments:
+        expression {str} -- The query.
+
+    Keyword Arguments:
+        now {float} -- Timestamp the ages count back from. (default: {time()})
+
+    Raises:
+        QueryError -- If the query isn't valid.
+
+    Returns:
+        dict -- Keyword arguments for `storage.TrackerStore.select`.
+    """
+    now = time() if now is None else now
+
+    try:
+        terms = shlex.split(expression)
+    except ValueError as err:
+        raise QueryError(f"Invalid query: {err}.") from None
+
+    criteria = {}
+    for term in terms:
+        field, sep, value = term.partition(":")
+        field = field.lower()
+        if not sep or not value:
+            raise QueryError(f'Invalid term {term!r}, expected "field:value".')
+        if field in criteria or (field == "updated" and "updated_after" in criteria):
+            raise QueryError(f'"{field}" can only be given once.')
+
+        if field == "status":
+            try:
+                criteria["status"] = frozenset(
+                    STATUS_NAMES[name] for name in value.lower().split(",")
+                )
+            except KeyError as err:
+                raise QueryError(
+                    f"Unknown status {err.args[0]!r}, expected any of: "
+                    "complete, incomplete, hiatus, cancelled."
+                ) from None
+        elif field == "author":
+            criteria["author"] = value
+        elif field in RANGE_FIELDS:
+            criteria[field] = _parse_range(field, value)
+        elif field == "updated":
+            criteria.update({"updated_after": None, "updated_before": None})
+            criteria.update(_parse_updated(value, now))
+        else:
+            raise QueryError(
+                f'Unknown field "{field}", expected any of: '
+                "status, author, words, chapters, updated."
+            )
+
+    return criteria
+
+
+def parse_sort(sort: str) -> tuple:
+    """Parses the name of a key from SORT_KEYS to sort the stories by, prefixed
+    by "-" to sort in descending order.
+
+    Arguments:
+        sort {str} -- The key, e.g. "words" or "-updated".
+
+    Raises:
+        QueryError -- If the key isn't one of SORT_KEYS.
+
+    Returns:
+        tuple -- The key and whether or not to sort in descending order.
+    """
+    descending = sort.startswith("-")
+    key = sort[1:] if descending else sort
+    if key not in SORT_KEYS:
+        raise QueryError(
+            f'Unknown sort key "{key}", expected any of: {", ".join(SORT_KEYS)}.'
+        )
+    return key, descending
+
+
+class StoryIndex:
+    """In-memory indexes over a snapshot of a tracking list, built one story
+    mapping key at a time as queries ask for them.
+
+    Arguments:
+        stories {Mapping} -- Story IDs to their story mapping.
+    """
+
+    def __init__(self, stories):
+        self.ids = []
+        self.records = []
+        for story_id, record in stories.items():
+            self.ids.append(story_id)
+            self.records.append(record)
+
+        self._positions = None
+        self._values = {}
+        self._groups = {}
+        self._sorted = {}
+
+    def _get_values(self, key: str) -> list:
+        values = self._values.get(key)
+        if values is None:
+            if key is None:
+                values = [int(story_id) for story_id in self.ids]
+            else:
+                values = [record[key] for record in self.records]
+            self._values[key] = values
+        return values
+
+    def _get_groups(self, key: str) -> dict:
+        # Positions of the stories by their value of the key, for the keys
+        # that stories share values on.
+        groups = self._groups.get(key)
+        if groups is None:
+            groups = self._groups[key] = {}
+            for position, value in enumerate(self._get_values(key)):
+                groups.setdefault(value, []).append(position)
+        return groups
+
+    def _get_sorted(self, key: str) -> tuple:
+        # The values of the key in ascending order, along with the position of
+        # the story each of them belongs to, to find ranges by bisection.
+        index = self._sorted.get(key)
+        if index is None:
+            values = self._get_values(key)
+            positions = sorted(range(len(values)), key=values.__getitem__)
+            index = self._sorted[key] = ([values[p] for p in positions], positions)
+        return index
+
+    def _get_range(self, key: str, low, high, *, high_inclusive=True) -> tuple:
+        values, positions = self._get_sorted(key)
+        start = 0 if low is None else bisect_left(values, low)
+        if high is None:
+            end = len(values)
+        elif high_inclusive:
+            end = bisect_right(values, high)
+        else:
+            end = bisect_left(values, high)
+
+        def matches(position):
+            value = self._values[key][position]
+            return (low is None or value >= low) and (
+                high is None or (value <= high if high_inclusive else value < high)
+            )
+
+        return end - start, lambda: positions[start:end], matches
+
+    def _get_criteria(
+        self,
+        *,
+        story_ids=None,
+        status=None,
+        author=None,
+        words=None,
+        chapters=None,
+        updated_after=None,
+        updated_before=None,
+        shard=None,
+    ) -> list:
+        # Every criteria as the amount of stories it matches, a function that
+        # returns their positions and one that tells if a position matches.
+        criteria = []
+
+        if story_ids is not None:
+            if self._positions is None:
+                self._positions = {i: p for p, i in enumerate(self.ids)}
+            selected = {self._positions[i] for i in story_ids if i in self._positions}
+            criteria.append((len(selected), lambda: selected, selected.__contains__))
+
+        for key, values in [("completion-status", status), ("author", author)]:
+            if values is None:
+                continue
+            if key == "author":
+                values = [values]
+
+            groups = self._get_groups(key)
+            positions = [p for value in set(values) for p in groups.get(value, ())]
+            values = frozenset(values)
+            criteria.append(
+                (
+                    len(positions),
+                    lambda positions=positions: positions,
+                    lambda p, key=key, values=values: self._values[key][p] in values,
+                )
+            )
+
+        for key, bounds in [
+            (RANGE_FIELDS["words"], words),
+            (RANGE_FIELDS["chapters"], chapters),
+        ]:
+            if bounds is not None:
+                criteria.append(self._get_range(key, *bounds))
+
+        if updated_after is not None or updated_before is not None:
+            criteria.append(
+                self._get_range(
+                    "last-update-timestamp",
+                    updated_after,
+                    updated_before,
+                    high_inclusive=False,
+                )
+            )
+
+        if shard is not None:
+            index, count = shard
+            ids = self.ids
+
+            def in_shard(position):
+                return get_shard(ids[position], count) == index
+
+            # Not indexed, as every worker of a shard asks for a different one.
+            criteria.append(
+                (
+                    len(ids) // count,
+                    lambda: filter(in_shard, range(len(ids))),
+                    in_shard,
+                )
+            )
+
+        return criteria
+
+    def select(self, *, sort=None, limit=None, **criteria):
+        """Iterates over the stories that match every given criteria.
+
+        Keyword Arguments:
+            sort {tuple} -- Key and order to sort by, from `parse_sort`.
+            Otherwise they are in the order they were added to the tracking
+            list. (default: {None})
+            limit {int} -- Maximum amount of stories. (default: {None})
+            The rest are the ones of `storage.TrackerStore.select`.
+
+        Yields:
+            tuple -- Pairs of story ID and story mapping.
+        """
+        criteria = self._get_criteria(**criteria)
+        if criteria:
+            # Starts from the criteria that matches the least stories, only
+            # checking the rest on those.
+            criteria.sort(key=lambda c: c[0])
+            _, get_positions, _ = criteria[0]
+            checks = [matches for _, _, matches in criteria[1:]]
+            positions = [
+                p for p in get_positions() if all(check(p) for check in checks)
+            ]
+            # Back in the order of the tracking list, which is also the order
+            # of the stories that sort the same.
+            positions.sort()
+        else:
+            positions = range(len(self.ids))
+
+        if sort is not None:
+            key, descending = sort
+            values = self._get_values(SORT_KEYS[key])
+            if limit is not None:
+                pick = heapq.nlargest if descending else heapq.nsmallest
+                positions = pick(limit, positions, key=values.__getitem__)
+            else:
+                positions = sorted(
+                    positions, key=values.__getitem__, reverse=descending
+                )
+        elif limit is not None:
+            positions = positions[:limit]
+
+        for position in positions:
+            yield self.ids[position], self.records[position]
@@ -0,0 +1,147 @@
+import sys
+from array import array
+from collections.abc import Mapping, MutableMapping
+
+# Story mapping keys with a slot of their own on StoryRecord, in the order they
+# are listed and saved in.
+RECORD_SLOTS = {
+    "title": "title",
+    "author": "author",
+    "chapter-amt": "chapter_amt",
+    "words": "words",
+    "last-update-timestamp": "last_update_timestamp",
+    "completion-status": "completion_status",
+    "content-digest": "content_digest",
+    "content-size": "content_size",
+    "update-history": "update_history",
+    "last-check-timestamp": "last_check_timestamp",
+}
+
+
+def _pack_history(timestamps) -> array:
+    # Timestamps from Fimfiction are integers, kept as such to save them back
+    # the same way.
+    if all(isinstance(t, int) for t in timestamps):
+        return array("q", timestamps)
+    return array("d", timestamps)
+
+
+# How the values of some slots are kept, and how they are given back.
+_PACK = {
+    "author": sys.intern,
+    "update_history": _pack_history,
+    "content_digest": bytes.fromhex,
+}
+_UNPACK = {"update_history": list, "content_digest": bytes.hex}
+
+# Keys every story mapping has.
+REQUIRED_KEYS = frozenset(list(RECORD_SLOTS)[:6])
+
+
+class StoryRecord(MutableMapping):
+    """Story mapping of the tracking list that takes a fraction of the memory
+    of a dict. The known keys are kept on slots, the name of the author is
+    interned as it is often shared between stories, and the update history
+    and content digest are packed.
+
+    It behaves as the dict it replaces, any other key is kept on a dict of its
+    own. Keys from RECORD_SLOTS that the story doesn't have are left unset.
+
+    Arguments:
+        data {Mapping} -- Story mapping to take the keys from.
+    """
+
+    __slots__ = (*RECORD_SLOTS.values(), "extra")
+
+    def __init__(self, data=()):
+        self.extra = None
+        # Same as setting every item, without going through __setitem__, as
+        # this is called for every story loaded.
+        for key, value in data.items() if isinstance(data, Mapping) else data:
+            attr = RECORD_SLOTS.get(key)
+            if attr is None:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+                continue
+
+            pack = _PACK.get(attr)
+            setattr(self, attr, pack(value) if pack is not None else value)
+
+    @classmethod
+    def from_json_object(cls, obj: dict):
+        """Hook for `json.load` that turns the story mappings of a tracker
+        file into records as they are parsed, leaving other objects as is."""
+        if REQUIRED_KEYS.issubset(obj):
+            return cls(obj)
+        return obj
+
+    def __getitem__(self, key: str):
+        attr = RECORD_SLOTS.get(key)
+        if attr is None:
+            if self.extra is not None and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+
+        try:
+            value = getattr(self, attr)
+        except AttributeError:
+            raise KeyError(key) from None
+
+        unpack = _UNPACK.get(attr)
+        return unpack(value) if unpack is not None else value
+
+    def __setitem__(self, key: str, value):
+        attr = RECORD_SLOTS.get(key)
+        if attr is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+            return
+
+        pack = _PACK.get(attr)
+        setattr(self, attr, pack(value) if pack is not None else value)
+
+    def __delitem__(self, key: str):
+        attr = RECORD_SLOTS.get(key)
+        if attr is None:
+            if self.extra is None or key not in self.extra:
+                raise KeyError(key)
+            del self.extra[key]
+            return
+
+        try:
+            delattr(self, attr)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for key, attr in RECORD_SLOTS.items():
+            if hasattr(self, attr):
+                yield key
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key) -> bool:
+        attr = RECORD_SLOTS.get(key)
+        if attr is not None:
+            return hasattr(self, attr)
+        return self.extra is not None and key in self.extra
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        """Returns the record as a plain dict, as it is saved on the tracker
+        file."""
+        return {key: self[key] for key in self}
+
+
+def to_json(obj):
+    """Hook for `json.dump` that writes records as the dicts they replace."""
+    if isinstance(obj, StoryRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,164 @@
+import os
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from time import monotonic
+from typing import NamedTuple
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+class CommandResult(NamedTuple):
+    """Outcome of a command executed with `run_command`.
+
+    Attributes:
+        returncode {int} -- Exit code of the command, negative if it was killed
+        by a signal.
+        timed_out {bool} -- Whether or not it was killed for taking too long.
+        wall_time {float} -- Seconds from its start to its end.
+        user_time {float} -- Seconds of CPU time spent in user mode, None where
+        it isn't available.
+        system_time {float} -- Seconds of CPU time spent in kernel mode, None
+        where it isn't available.
+        max_rss {int} -- Peak resident memory in bytes, None where it isn't
+        available.
+        log_path {Path} -- File where its output went, if any.
+    """
+
+    returncode: int
+    timed_out: bool
+    wall_time: float
+    user_time: float = None
+    system_time: float = None
+    max_rss: int = None
+    log_path: Path = None
+
+
+def _get_slots(limit: int) -> threading.BoundedSemaphore:
+    global _slots
+
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(max(1, limit))
+        return _slots
+
+
+def _kill(proc: subprocess.Popen):
+    try:
+        if os.name == "posix":
+            # Takes down whatever the command started as well.
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+
+
+def _wait(proc: subprocess.Popen) -> tuple:
+    if not hasattr(os, "wait4"):
+        return proc.wait(), None
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, rusage
+
+
+def run_command(
+    cmd: list, config: dict, *, log_path: Path = None, quiet: bool = False
+) -> CommandResult:
+    """Executes the command once one of the download_alt_concurrency slots is
+    free, killing it if it runs for longer than download_alt_timeout.
+
+    Arguments:
+        cmd {List[str]} -- Command to execute.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        log_path {Path} -- File to write the output of the command to.
+        (default: {None})
+        quiet {bool} -- Discard the output when log_path isn't given, instead
+        of letting it through. (default: {False})
+
+    Returns:
+        CommandResult -- Outcome of the command.
+    """
+    timeout = config["download_alt_timeout"]
+
+    with _get_slots(config["download_alt_concurrency"]):
+        log_file = None
+        if log_path is not None:
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            log_file = log_path.open("wb")
+            output = {"stdout": log_file, "stderr": subprocess.STDOUT}
+        elif quiet:
+            output = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        else:
+            output = {}
+
+        try:
+            start = monotonic()
+            proc = subprocess.Popen(cmd, start_new_session=os.name == "posix", **output)
+
+            killed = threading.Event()
+
+            def kill():
+                killed.set()
+                _kill(proc)
+
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout, kill)
+                timer.daemon = True
+                timer.start()
+
+            try:
+                returncode, rusage = _wait(proc)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+            wall_time = monotonic() - start
+        finally:
+            if log_file is not None:
+                log_file.close()
+
+    if rusage is None:
+        return CommandResult(returncode, killed.is_set(), wall_time, log_path=log_path)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else.
+    max_rss = rusage.ru_maxrss * (1 if os.uname().sysname == "Darwin" else 1024)
+    return CommandResult(
+        returncode,
+        killed.is_set(),
+        wall_time,
+        rusage.ru_utime,
+        rusage.ru_stime,
+        max_rss,
+        log_path,
+    )
+
+
+def get_result_str(result: CommandResult) -> str:
+    """Returns a human readable summary of the resources used by a command.
+
+    Arguments:
+        result {CommandResult} -- Outcome of the command.
+
+    Returns:
+        str -- The summary.
+    """
+    from .funcs import get_size_str_from_bytes
+
+    summary = f"{result.wall_time:.2f}s"
+    if result.user_time is not None:
+        summary += ", user {0:.2f}s, system {1:.2f}s, max RSS {2}".format(
+            result.user_time,
+            result.system_time,
+            get_size_str_from_bytes(result.max_rss),
+        )
+    return summary
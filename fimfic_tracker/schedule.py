@@ -0,0 +1,220 @@
+import heapq
+from statistics import median
+from time import time
+
+from .constants import StoryStatus
+
+# Amount of update timestamps to keep for each story.
+UPDATE_HISTORY_SIZE = 10
+
+
+def record_check(story_data: dict, checked_data: dict = None, *, now=None) -> dict:
+    """Returns the story mapping updated with the data obtained from checking
+    the story, keeping track of when it was checked and of its update history.
+
+    Arguments:
+        story_data {dict} -- Story mapping from the tracked list.
+
+    Keyword Arguments:
+        checked_data {dict} -- Story mapping from `funcs.get_story_data` to
+        save over story_data, if any. (default: {None})
+        now {float} -- Timestamp of the check. (default: {time()})
+
+    Returns:
+        dict -- The new story mapping, with the additional keys:
+            - `update-history` {List[float]} -- Timestamps of the last updates
+            seen, oldest first.
+            - `last-check-timestamp` {float} -- Timestamp of the last check.
+    """
+    record = {**story_data, **(checked_data or {})}
+
+    history = list(
+        story_data.get("update-history", [story_data["last-update-timestamp"]])
+    )
+    if record["last-update-timestamp"] > history[-1]:
+        history.append(record["last-update-timestamp"])
+
+    record["update-history"] = history[-UPDATE_HISTORY_SIZE:]
+    record["last-check-timestamp"] = time() if now is None else now
+    return record
+
+
+def get_check_interval(story_data: dict, config: dict, *, now=None) -> float:
+    """Returns the seconds to wait after a check of the story before checking it
+    again, from how often it has been updated.
+
+    Stories are expected to update again after the median time between their
+    past updates. Once that time has passed without one, or when there isn't
+    enough history, the interval grows with the time since the last update.
+
+    Arguments:
+        story_data {dict} -- Story mapping from the tracked list.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        now {float} -- Timestamp of the check. (default: {time()})
+
+    Returns:
+        float -- Seconds until the next check.
+    """
+    if story_data["completion-status"] != StoryStatus.incomplete:
+        return config["check_inactive_interval"]
+
+    now = time() if now is None else now
+    history = story_data.get("update-history", [story_data["last-update-timestamp"]])
+    since_update = max(0, now - history[-1])
+
+    intervals = [b - a for a, b in zip(history, history[1:])]
+    if intervals and since_update < median(intervals):
+        interval = median(intervals) - since_update
+    else:
+        interval = since_update / 4
+
+    return min(
+        max(interval, config["check_min_interval"]), config["check_max_interval"]
+    )
+
+
+def get_check_priority(story_data: dict, config: dict, *, now=None) -> float:
+    """Returns how overdue a check of the story is, as the ratio between the
+    time since it was last checked and its check interval.
+
+    Arguments:
+        story_data {dict} -- Story mapping from the tracked list.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        now {float} -- Current timestamp. (default: {time()})
+
+    Returns:
+        float -- Where 1 or more means that a check is due. Stories that were
+        never checked are always due.
+    """
+    now = time() if now is None else now
+
+    last_check = story_data.get("last-check-timestamp")
+    if last_check is None:
+        return float("inf")
+
+    return (now - last_check) / get_check_interval(story_data, config, now=last_check)
+
+
+def get_next_check_timestamp(story_data: dict, config: dict, *, now=None) -> float:
+    """Returns when the story should be checked next.
+
+    Arguments:
+        story_data {dict} -- Story mapping from the tracked list.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        now {float} -- Current timestamp. (default: {time()})
+
+    Returns:
+        float -- Timestamp of the next check.
+    """
+    now = time() if now is None else now
+
+    last_check = story_data.get("last-check-timestamp")
+    if last_check is None:
+        return now
+
+    return last_check + get_check_interval(story_data, config, now=last_check)
+
+
+def get_due_stories(stories, config: dict, *, now=None) -> list:
+    """Returns the stories whose check is due, the most overdue first.
+
+    Arguments:
+        stories {Iterable[tuple]} -- Pairs of story ID and story mapping.
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Keyword Arguments:
+        now {float} -- Current timestamp. (default: {time()})
+
+    Returns:
+        List[tuple] -- Pairs of story ID and story mapping.
+    """
+    now = time() if now is None else now
+
+    due = []
+    for story_id, story_data in stories:
+        priority = get_check_priority(story_data, config, now=now)
+        if priority >= 1:
+            due.append((priority, story_id, story_data))
+
+    due.sort(key=lambda t: t[0], reverse=True)
+    return [(story_id, story_data) for _, story_id, story_data in due]
+
+
+class CheckQueue:
+    """Priority queue of story IDs ordered by when they are due for a check,
+    where pushing an already queued story moves it to its new deadline."""
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, story_id) -> bool:
+        return story_id in self._deadlines
+
+    def __iter__(self):
+        return iter(list(self._deadlines))
+
+    def push(self, story_id: str, deadline: float):
+        """Queues the story to be due at the given timestamp.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+            deadline {float} -- Timestamp of when the check is due.
+        """
+        if self._deadlines.get(story_id) == deadline:
+            return
+
+        # The previous entry of the story, if any, stays on the heap and gets
+        # skipped once it reaches the top.
+        self._deadlines[story_id] = deadline
+        heapq.heappush(self._heap, (deadline, story_id))
+
+    def discard(self, story_id: str):
+        """Removes the story from the queue if it is there.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+        """
+        self._deadlines.pop(story_id, None)
+
+    def _drop_stale(self):
+        while self._heap:
+            deadline, story_id = self._heap[0]
+            if self._deadlines.get(story_id) == deadline:
+                return
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> float:
+        """Returns the timestamp of the earliest deadline, None if the queue is
+        empty."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list:
+        """Removes and returns every story that is due at the given timestamp,
+        earliest deadline first.
+
+        Arguments:
+            now {float} -- Current timestamp.
+
+        Returns:
+            List[str] -- IDs of the due stories.
+        """
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+
+            _, story_id = heapq.heappop(self._heap)
+            del self._deadlines[story_id]
+            due.append(story_id)
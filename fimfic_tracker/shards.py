@@ -0,0 +1,159 @@
+import json
+import re
+import zlib
+from pathlib import Path
+
+from .records import to_json
+
+_SHARD_REGEX = re.compile(r"(?P<index>\d+)/(?P<count>\d+)")
+
+
+def parse_shard(value: str) -> tuple:
+    """Parses a shard given as K/N, the Kth out of N shards counting from 1.
+
+    Arguments:
+        value {str} -- The shard, e.g. "2/4".
+
+    Raises:
+        ValueError -- If the shard isn't valid.
+
+    Returns:
+        tuple -- The index of the shard counting from 0 and the amount of
+        shards.
+    """
+    match = _SHARD_REGEX.fullmatch(value.strip())
+    if not match:
+        raise ValueError(f'Invalid shard {value!r}, expected "K/N" like "1/4".')
+
+    index, count = int(match.group("index")), int(match.group("count"))
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {value!r}, K has to be from 1 to N.")
+    return index - 1, count
+
+
+def get_shard(story_id: str, count: int) -> int:
+    """Returns the index of the shard, out of count, the story belongs to.
+
+    The same on every process and host, unlike the built-in hash of strings.
+
+    Arguments:
+        story_id {str} -- ID of the story.
+        count {int} -- Amount of shards.
+
+    Returns:
+        int -- Index of the shard counting from 0.
+    """
+    return zlib.crc32(story_id.encode()) % count
+
+
+def get_shard_results_path(config: dict, shard: tuple) -> Path:
+    """Returns the path of the results file of the given shard.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+        shard {tuple} -- Shard from `parse_shard`.
+
+    Returns:
+        Path -- Path inside of shard_results_dir.
+    """
+    index, count = shard
+    return config["shard_results_dir"] / f"shard-{index + 1}-of-{count}.ndjson"
+
+
+class ShardResults:
+    """Results file of a shard, that takes the place of the tracking list for
+    `__main__.update_stories`. Every story mapping saved to it is appended as
+    a line of JSON right away, so that nothing done is lost if the shard is
+    interrupted.
+
+    Arguments:
+        path {Path} -- Path of the results file, appended to if it exists.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8", buffering=1)
+
+    def update_story(self, story_id: str, story_data: dict):
+        self._file.write(
+            json.dumps(
+                {"id": story_id, "data": story_data},
+                ensure_ascii=False,
+                default=to_json,
+            )
+            + "\n"
+        )
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_shard_results(path: Path):
+    """Iterates over the story mappings saved on a results file of a shard.
+    The last line may be cut short if the shard was interrupted while writing
+    it, in which case it is left out.
+
+    Arguments:
+        path {Path} -- Path of the results file.
+
+    Yields:
+        tuple -- Pairs of story ID and story mapping, in the order they were
+        saved.
+    """
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                return
+            if not line.strip():
+                continue
+
+            result = json.loads(line)
+            yield result["id"], result["data"]
+
+
+def merge_shard_results(track_data, paths, *, keep=False) -> tuple:
+    """Saves the story mappings from the results files of shards to the
+    tracking list, and removes the files once they are written to it.
+
+    Results of stories that aren't tracked anymore are left out, as well as
+    the ones older than the last check saved on the tracking list.
+
+    Arguments:
+        track_data {TrackerStore} -- Tracking list to save the results to.
+        paths {Iterable[Path]} -- Results files, from the oldest results to
+        the newest.
+
+    Keyword Arguments:
+        keep {bool} -- Whether or not to keep the files. (default: {False})
+
+    Returns:
+        tuple -- Amount of stories saved, and of results left out.
+    """
+    paths = list(paths)
+    merged = set()
+    skipped = 0
+
+    for path in paths:
+        for story_id, story_data in read_shard_results(path):
+            current = track_data.get(story_id)
+            last_check = story_data.get("last-check-timestamp", 0)
+            if current is None or current.get("last-check-timestamp", 0) > last_check:
+                skipped += 1
+                continue
+
+            track_data.update_story(story_id, story_data)
+            merged.add(story_id)
+
+    track_data.flush()
+    if not keep:
+        for path in paths:
+            path.unlink()
+
+    return len(merged), skipped
@@ -0,0 +1,136 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def _percentile(sorted_values: list, percent: float) -> float:
+    # Nearest-rank method, which always returns one of the values.
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+class Stats:
+    """Collects how long each phase of a command took and how much of things
+    like bytes it went through, from any thread.
+
+    Nothing is collected until `enable` is called.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._timings = defaultdict(list)
+        self._counters = defaultdict(int)
+        self._sources = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, phase: str, seconds: float):
+        """Adds a timing of the given phase.
+
+        Arguments:
+            phase {str} -- Name of the phase.
+            seconds {float} -- How long it took.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._timings[phase].append(seconds)
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Records how long the body of the `with` statement takes as a timing
+        of the given phase, even if it raises.
+
+        Arguments:
+            phase {str} -- Name of the phase.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1):
+        """Adds the given amount to a counter.
+
+        Arguments:
+            name {str} -- Name of the counter.
+
+        Keyword Arguments:
+            amount {int} -- (default: {1})
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._counters[name] += amount
+
+    def add_source(self, name: str, func):
+        """Includes what the given function returns in the summary, under the
+        given name.
+
+        Arguments:
+            name {str} -- Key to put the value under.
+            func {Callable} -- Function returning a JSON serializable value.
+        """
+        self._sources[name] = func
+
+    def summary(self) -> dict:
+        """Returns everything collected so far.
+
+        Returns:
+            dict -- Mapping of the following keys:
+                - `phases` {dict} -- For each phase, its amount of timings and
+                their total, mean, 50th, 90th and 99th percentiles and maximum,
+                in seconds.
+                - `counters` {dict} -- The value of each counter.
+                And one key for every source added with `add_source`.
+        """
+        with self._lock:
+            timings = {phase: sorted(values) for phase, values in self._timings.items()}
+            counters = dict(self._counters)
+
+        phases = {}
+        for phase, values in sorted(timings.items()):
+            total = sum(values)
+            phases[phase] = {
+                "count": len(values),
+                "total": total,
+                "mean": total / len(values),
+                "p50": _percentile(values, 50),
+                "p90": _percentile(values, 90),
+                "p99": _percentile(values, 99),
+                "max": values[-1],
+            }
+
+        return {
+            "phases": phases,
+            "counters": counters,
+            **{name: func() for name, func in self._sources.items()},
+        }
+
+
+def get_stats() -> Stats:
+    """Returns the stats collector of this process, creating it on its first
+    call.
+
+    Returns:
+        Stats -- The shared collector.
+    """
+    global _stats
+
+    with _stats_lock:
+        if _stats is None:
+            _stats = Stats()
+        return _stats
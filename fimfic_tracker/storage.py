@@ -0,0 +1,555 @@
+import json
+import os
+from collections.abc import MutableMapping
+from time import monotonic
+
+from .exceptions import TrackerLockError
+from .funcs import save_to_track_file
+from .locking import lock_file
+from .query import SORT_KEYS, StoryIndex
+from .records import StoryRecord
+from .shards import get_shard
+from .stats import get_stats
+
+
+class TrackerStore(MutableMapping):
+    """Base of the storages for the tracking list, a mapping of story IDs to
+    their story mapping, where changes are written in batches instead of one by
+    one.
+
+    Changes are written once tracker_flush_every of them have been made, or
+    default_flush_every if it isn't set, or tracker_flush_interval seconds have
+    passed since the last write, whatever happens first, and always on `flush`
+    or `close`. Only the stories changed by this process are written, over
+    whatever other processes wrote to the tracker file in the meantime.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+    """
+
+    # Changes after which to write when tracker_flush_every isn't set. Only the
+    # interval triggers writes by default, as they may rewrite the whole
+    # tracking list.
+    default_flush_every = 0
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.flush_every = config.get("tracker_flush_every", self.default_flush_every)
+        self.flush_interval = config["tracker_flush_interval"]
+        self.lock_timeout = config["tracker_lock_timeout"]
+
+        self._pending = 0
+        self._changed_ids = set()
+        # Stories set instead of updated, which are written even if another
+        # process deleted them before the next flush.
+        self._added_ids = set()
+        self._last_flush = monotonic()
+        self._index = None
+
+    def _changed(self, story_id: str, added: bool = False):
+        # Called before the change itself, so that an interruption between
+        # both can't leave it out of the next flush.
+        self._pending += 1
+        self._changed_ids.add(story_id)
+        if added:
+            self._added_ids.add(story_id)
+        self._index = None
+
+    def _maybe_flush(self):
+        if (self.flush_every and self._pending >= self.flush_every) or (
+            self.flush_interval
+            and monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def _set(self, story_id: str, story_data: dict, added: bool):
+        raise NotImplementedError
+
+    def __setitem__(self, story_id: str, story_data: dict):
+        self._set(story_id, story_data, added=True)
+
+    def update_story(self, story_id: str, story_data: dict):
+        """Replaces the mapping of a story on the tracking list. Unlike setting
+        it, the story is left out if another process untracked it meanwhile.
+
+        Arguments:
+            story_id {str} -- ID of the story.
+            story_data {dict} -- New mapping of the story.
+        """
+        self._set(story_id, story_data, added=False)
+
+    def _write(self):
+        raise NotImplementedError
+
+    def reload(self) -> bool:
+        """Picks up the changes made to the tracking list by other processes,
+        keeping the ones made by this one that weren't written yet.
+
+        Returns:
+            bool -- Whether or not there was any change to pick up.
+        """
+        raise NotImplementedError
+
+    def select(
+        self,
+        *,
+        story_ids=None,
+        status=None,
+        author=None,
+        words=None,
+        chapters=None,
+        updated_after=None,
+        updated_before=None,
+        shard=None,
+        sort=None,
+        limit=None,
+    ):
+        """Iterates over the stories that match every given criteria, in the
+        order they were added to the tracking list unless sorted.
+
+        The criteria are looked up on a `query.StoryIndex` of the tracking
+        list, kept until it changes.
+
+        Keyword Arguments:
+            story_ids {Iterable[str]} -- IDs of the stories. (default: {None})
+            status {Iterable[int]} -- StoryStatus enum values. (default: {None})
+            author {str} -- Name of the author. (default: {None})
+            words {tuple} -- Minimum and maximum amount of words, either can
+            be None. (default: {None})
+            chapters {tuple} -- Minimum and maximum amount of chapters, either
+            can be None. (default: {None})
+            updated_after {float} -- Timestamp the last update has to be at or
+            after. (default: {None})
+            updated_before {float} -- Timestamp the last update has to be
+            before. (default: {None})
+            shard {tuple} -- Shard the stories have to belong to, from
+            `shards.parse_shard`. (default: {None})
+            sort {tuple} -- Key and order to sort by, from `query.parse_sort`.
+            (default: {None})
+            limit {int} -- Maximum amount of stories. (default: {None})
+
+        Yields:
+            tuple -- Pairs of story ID and story mapping.
+        """
+        if self._index is None:
+            self._index = StoryIndex(self)
+
+        return self._index.select(
+            story_ids=story_ids,
+            status=status,
+            author=author,
+            words=words,
+            chapters=chapters,
+            updated_after=updated_after,
+            updated_before=updated_before,
+            shard=shard,
+            sort=sort,
+            limit=limit,
+        )
+
+    def flush(self):
+        """Writes the changes to the tracking list that weren't written yet."""
+        if not self._pending:
+            return
+
+        with get_stats().timed("tracker_save"):
+            self._write()
+        self._pending = 0
+        self._changed_ids.clear()
+        self._added_ids.clear()
+        self._last_flush = monotonic()
+
+    def close(self):
+        """Writes any pending change and releases the storage."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONTrackerStore(TrackerStore):
+    """Tracking list loaded whole from the tracker file as JSON and kept in
+    memory as StoryRecord objects, rewriting the file on every flush.
+
+    Writes hold a lock on a ".lock" file next to the tracker file, under which
+    the file is read back if another process wrote to it since, so that the
+    changes of both end up on it."""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+
+        self.tracker_file = config["tracker_file"]
+        self.lock_path = self.tracker_file.with_name(self.tracker_file.name + ".lock")
+
+        if not self.tracker_file.exists():
+            self.tracker_file.parent.mkdir(parents=True, exist_ok=True)
+            with lock_file(self.lock_path, self.lock_timeout):
+                # Unless another process created it while waiting for the lock.
+                if not self.tracker_file.exists():
+                    save_to_track_file({}, config)
+
+        # Read without the lock, as writes replace the file instead of writing
+        # over it.
+        self._data = self._read()
+
+    @staticmethod
+    def _get_file_stat(st: os.stat_result) -> tuple:
+        # The inode changes on every write, as the file is replaced instead of
+        # written over.
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _stat(self) -> tuple:
+        try:
+            st = self.tracker_file.stat()
+        except FileNotFoundError:
+            return None
+        return self._get_file_stat(st)
+
+    def _read(self) -> dict:
+        with self.tracker_file.open("r", encoding="utf-8") as f:
+            self._file_stat = self._get_file_stat(os.fstat(f.fileno()))
+            return json.load(f, object_hook=StoryRecord.from_json_object)
+
+    def __getitem__(self, story_id: str) -> dict:
+        return self._data[story_id]
+
+    def _set(self, story_id: str, story_data: dict, added: bool):
+        if not added and story_id not in self._data:
+            return
+        if not isinstance(story_data, StoryRecord):
+            story_data = StoryRecord(story_data)
+
+        self._changed(story_id, added)
+        self._data[story_id] = story_data
+        self._maybe_flush()
+
+    def __delitem__(self, story_id: str):
+        if story_id not in self._data:
+            raise KeyError(story_id)
+
+        self._changed(story_id)
+        del self._data[story_id]
+        self._maybe_flush()
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, story_id) -> bool:
+        return story_id in self._data
+
+    def _write(self):
+        with lock_file(self.lock_path, self.lock_timeout):
+            self.reload()
+            save_to_track_file(self._data, self.config)
+            self._file_stat = self._stat()
+
+    def reload(self) -> bool:
+        if self._stat() == self._file_stat:
+            return False
+
+        data = self._read()
+        for story_id in self._changed_ids:
+            if story_id not in self._data:
+                data.pop(story_id, None)
+            elif story_id in data or story_id in self._added_ids:
+                data[story_id] = self._data[story_id]
+
+        self._data = data
+        self._index = None
+        return True
+
+
+# Story mapping keys with a column of their own, any other key is kept as JSON
+# on the "extra" column.
+SQLITE_COLUMNS = {
+    "title": "title",
+    "author": "author",
+    "chapter-amt": "chapter_amt",
+    "words": "words",
+    "last-update-timestamp": "last_update_timestamp",
+    "completion-status": "completion_status",
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stories (
+    id TEXT PRIMARY KEY NOT NULL,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    chapter_amt INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    last_update_timestamp NUMERIC NOT NULL,
+    completion_status INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS stories_completion_status
+    ON stories (completion_status);
+CREATE INDEX IF NOT EXISTS stories_last_update_timestamp
+    ON stories (last_update_timestamp);
+CREATE INDEX IF NOT EXISTS stories_author ON stories (author);
+CREATE INDEX IF NOT EXISTS stories_words ON stories (words);
+CREATE INDEX IF NOT EXISTS stories_chapter_amt ON stories (chapter_amt);
+"""
+
+
+# Seconds to wait for the database lock with a tracker_lock_timeout of 0, as
+# SQLite can't be told to wait for as long as it takes.
+SQLITE_MAX_TIMEOUT = 24 * 24 * 60 * 60
+
+
+class SQLiteTrackerStore(TrackerStore):
+    """Tracking list kept on a SQLite database at the tracker file, where only
+    the rows that are asked for are read.
+
+    Changed rows are kept in memory and written in a single transaction on
+    every flush, so that the database is only locked for writes while writing
+    them. Reads that go over the whole tracking list write them first."""
+
+    default_flush_every = 100
+
+    _SELECT = "SELECT id, {0}, extra FROM stories".format(
+        ", ".join(SQLITE_COLUMNS.values())
+    )
+    _UPDATE = "UPDATE stories SET {0}, extra = ? WHERE id = ?".format(
+        ", ".join(f"{column} = ?" for column in SQLITE_COLUMNS.values())
+    )
+    _INSERT = "INSERT INTO stories (id, {0}, extra) VALUES (?, {1}?)".format(
+        ", ".join(SQLITE_COLUMNS.values()), "?, " * len(SQLITE_COLUMNS)
+    )
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+
+        import sqlite3
+
+        tracker_file = config["tracker_file"]
+        tracker_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+            str(tracker_file), timeout=self.lock_timeout or SQLITE_MAX_TIMEOUT
+        )
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SQLITE_SCHEMA)
+        self.connection.create_function("fimfic_shard", 2, get_shard)
+        self._data_version = self._get_data_version()
+
+        # Rows changed since the last write by story ID, None for the deleted
+        # ones.
+        self._pending_rows = {}
+
+    def _get_data_version(self) -> int:
+        # Changes whenever another connection commits to the database.
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    @staticmethod
+    def _to_story(row) -> tuple:
+        story_id, *values, extra = row
+        story_data = StoryRecord(zip(SQLITE_COLUMNS, values))
+        if extra:
+            story_data.update(json.loads(extra))
+        return story_id, story_data
+
+    def __getitem__(self, story_id: str) -> dict:
+        if story_id in self._pending_rows:
+            row = self._pending_rows[story_id]
+        else:
+            row = self.connection.execute(
+                self._SELECT + " WHERE id = ?", (story_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(story_id)
+        return self._to_story(row)[1]
+
+    def _set(self, story_id: str, story_data: dict, added: bool):
+        values = [story_data[key] for key in SQLITE_COLUMNS]
+        extra = {k: v for k, v in story_data.items() if k not in SQLITE_COLUMNS}
+        values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+
+        self._changed(story_id, added)
+        self._pending_rows[story_id] = (story_id, *values)
+        self._maybe_flush()
+
+    def __delitem__(self, story_id: str):
+        if story_id not in self:
+            raise KeyError(story_id)
+
+        self._changed(story_id)
+        self._pending_rows[story_id] = None
+        self._maybe_flush()
+
+    def __iter__(self):
+        self._write()
+        for (story_id,) in self.connection.execute(
+            "SELECT id FROM stories ORDER BY rowid"
+        ):
+            yield story_id
+
+    def __len__(self) -> int:
+        self._write()
+        return self.connection.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
+
+    def __contains__(self, story_id) -> bool:
+        if story_id in self._pending_rows:
+            return self._pending_rows[story_id] is not None
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM stories WHERE id = ?", (story_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def items(self):
+        self._write()
+        for row in self.connection.execute(self._SELECT + " ORDER BY rowid"):
+            yield self._to_story(row)
+
+    def select(
+        self,
+        *,
+        story_ids=None,
+        status=None,
+        author=None,
+        words=None,
+        chapters=None,
+        updated_after=None,
+        updated_before=None,
+        shard=None,
+        sort=None,
+        limit=None,
+    ):
+        self._write()
+        conditions, params = [], []
+
+        if story_ids is not None:
+            # Through a temporary table, since the amount of IDs can go over
+            # the limit of parameters a query can have.
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS selected_ids (id TEXT PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM selected_ids")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO selected_ids VALUES (?)",
+                ((story_id,) for story_id in story_ids),
+            )
+            # Otherwise the transaction would be left open until the next
+            # write.
+            self.connection.commit()
+            conditions.append("id IN (SELECT id FROM selected_ids)")
+
+        if status is not None:
+            status = list(status)
+            conditions.append(
+                "completion_status IN ({0})".format(", ".join("?" * len(status)))
+            )
+            params.extend(status)
+
+        if author is not None:
+            conditions.append("author = ?")
+            params.append(author)
+        for column, bounds in [("words", words), ("chapter_amt", chapters)]:
+            low, high = bounds or (None, None)
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                params.append(high)
+
+        if updated_after is not None:
+            conditions.append("last_update_timestamp >= ?")
+            params.append(updated_after)
+        if updated_before is not None:
+            conditions.append("last_update_timestamp < ?")
+            params.append(updated_before)
+        if shard is not None:
+            index, count = shard
+            conditions.append("fimfic_shard(id, ?) = ?")
+            params.extend([count, index])
+
+        query = self._SELECT
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        if sort is not None:
+            key, descending = sort
+            column = (
+                SQLITE_COLUMNS[SORT_KEYS[key]]
+                if SORT_KEYS[key] is not None
+                else "CAST(id AS INTEGER)"
+            )
+            query += " ORDER BY {0} {1}, rowid".format(
+                column, "DESC" if descending else "ASC"
+            )
+        else:
+            query += " ORDER BY rowid"
+
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        for row in self.connection.execute(query, params):
+            yield self._to_story(row)
+
+    def _write(self):
+        if not self._pending_rows:
+            return
+
+        import sqlite3
+
+        try:
+            with self.connection:
+                for story_id, row in self._pending_rows.items():
+                    if row is None:
+                        self.connection.execute(
+                            "DELETE FROM stories WHERE id = ?", (story_id,)
+                        )
+                        continue
+
+                    # Updating in place, instead of replacing the row, keeps the
+                    # story at the same position of the tracking list.
+                    cursor = self.connection.execute(self._UPDATE, (*row[1:], story_id))
+                    # Unless another process deleted a story that was updated.
+                    if not cursor.rowcount and story_id in self._added_ids:
+                        self.connection.execute(self._INSERT, row)
+        except sqlite3.OperationalError as err:
+            if "locked" not in str(err):
+                raise
+            timeout = self.lock_timeout or SQLITE_MAX_TIMEOUT
+            raise TrackerLockError(
+                f'Gave up after {timeout} seconds waiting for "{self.config["tracker_file"]}" '
+                "to be unlocked by another process."
+            ) from err
+
+        self._pending_rows.clear()
+        self._added_ids.clear()
+
+    def reload(self) -> bool:
+        # Rows are always read from the database, so there is nothing to load.
+        data_version = self._get_data_version()
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+TRACKER_BACKENDS = {"json": JSONTrackerStore, "sqlite": SQLiteTrackerStore}
+
+
+def open_tracker_store(config: dict) -> TrackerStore:
+    """Opens the tracking list with the storage specified in config.
+
+    Arguments:
+        config {dict} -- Config mapping loaded from `confreader.load_config`.
+
+    Returns:
+        TrackerStore -- The tracking list.
+    """
+    return TRACKER_BACKENDS[config["tracker_backend"]](config)